@@ -0,0 +1,380 @@
+"""
+Pipeline Benchmarks
+
+Times sandwich detection, profit computation, the JSON load/save paths and
+block parsing on synthetic swap streams (and recorded blocks, when present),
+and writes a JSON report. Pass a previous report with --baseline to see how
+each stage moved.
+"""
+
+import contextlib
+import io
+import itertools
+import json
+import platform
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import profit_analysis
+import replay
+import sandwich_detect
+import utils
+from main import get_monitored_pools, save_transactions_to_file
+from simulation import SOL_MINT, create_tx
+from swap_store import PubkeyInterner
+
+RESULTS_DIR = Path("results")
+DEFAULT_REPORT_FILE = RESULTS_DIR / "benchmark.json"
+DEFAULT_SLOTS = 300
+DEFAULT_SWAPS_PER_SLOT = 50
+DEFAULT_SIGNERS = 2_000
+DEFAULT_TOKEN_PAIRS = 50
+DEFAULT_SANDWICHES = 200
+DEFAULT_REPEATS = 3
+DEFAULT_SEED = 7
+START_SLOT = 300_000_000
+START_BLOCK_TIME = 1_700_000_000
+SLOT_SECONDS = 0.4
+
+
+def generate_swap_stream(
+    slots: int = DEFAULT_SLOTS,
+    swaps_per_slot: int = DEFAULT_SWAPS_PER_SLOT,
+    signers: int = DEFAULT_SIGNERS,
+    token_pairs: int = DEFAULT_TOKEN_PAIRS,
+    sandwiches: int = DEFAULT_SANDWICHES,
+    seed: int = DEFAULT_SEED,
+) -> List[Dict[str, Any]]:
+    # Background swaps between SOL and token_pairs synthetic mints, plus
+    # injected front-run/victim/back-run triples inside the detector's slot
+    # gap. Random background traffic can form extra sandwiches of its own.
+    rng = random.Random(seed)
+    mints = [f"MINT{i:05d}" for i in range(token_pairs)]
+    prices = {mint: rng.uniform(1e2, 1e6) for mint in mints}
+    # slot -> [(order key, swap)]; keys place legs sharing a slot in order.
+    by_slot: Dict[int, List[Tuple[float, Dict[str, Any]]]] = {}
+    signature_ids = itertools.count()
+
+    def add(slot: int, key: float, signer: str, mint: str, buy: bool, sol: float):
+        signature = f"SIG{next(signature_ids):010d}"
+        tokens = sol * prices[mint] * rng.uniform(0.98, 1.0)
+        if buy:
+            tx = create_tx(signature, slot, signer, SOL_MINT, mint, sol, tokens)
+        else:
+            tx = create_tx(signature, slot, signer, mint, SOL_MINT, tokens, sol)
+        by_slot.setdefault(slot, []).append((key, tx))
+        return tx
+
+    for offset in range(slots):
+        for _ in range(swaps_per_slot):
+            add(
+                START_SLOT + offset,
+                rng.random(),
+                f"WALLET{rng.randrange(signers):06d}",
+                rng.choice(mints),
+                rng.random() < 0.5,
+                rng.uniform(0.01, 20),
+            )
+
+    max_gap = sandwich_detect.MAX_LEG_SLOT_GAP
+    for i in range(sandwiches):
+        mint = rng.choice(mints)
+        bot = f"BOT{i % max(1, sandwiches // 4):05d}"
+        front_slot = START_SLOT + rng.randrange(max(1, slots - 2 * max_gap))
+        victim_slot = front_slot + rng.randrange(max_gap)
+        back_slot = victim_slot + 1 + rng.randrange(max_gap)
+        sol = rng.uniform(1, 50)
+
+        front = add(front_slot, rng.random() / 2, bot, mint, True, sol)
+        add(
+            victim_slot,
+            0.5 + rng.random() / 2,
+            f"VICTIM{rng.randrange(signers):06d}",
+            mint,
+            True,
+            rng.uniform(0.1, 20),
+        )
+        back = add(back_slot, rng.random(), bot, mint, False, 0.0)
+        back["amount_in"] = front["amount_out"]
+        back["amount_out"] = sol * rng.uniform(1.0, 1.02)
+
+    transactions = []
+    for slot in sorted(by_slot):
+        block_time = int(START_BLOCK_TIME + (slot - START_SLOT) * SLOT_SECONDS)
+        for tx_index, (_, tx) in enumerate(sorted(by_slot[slot], key=lambda e: e[0])):
+            tx["tx_index"] = tx_index
+            tx["block_time"] = block_time
+            transactions.append(tx)
+    return transactions
+
+
+def time_call(fn: Callable[[], Any], repeats: int = DEFAULT_REPEATS) -> Dict[str, Any]:
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return {
+        "best_seconds": min(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "result": result,
+    }
+
+
+def _entry(timing: Dict[str, Any], items: int, unit: str) -> Dict[str, Any]:
+    best = timing["best_seconds"]
+    return {
+        "best_seconds": best,
+        "mean_seconds": timing["mean_seconds"],
+        "items": items,
+        "unit": unit,
+        "items_per_second": items / best if best else None,
+    }
+
+
+def _quiet(fn: Callable[[], Any]) -> Callable[[], Any]:
+    # The save/load helpers print progress lines on every call.
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+
+    return run
+
+
+def _profit_vectorized(sandwiches: List[Dict[str, Any]], prices, sol_price):
+    interner = PubkeyInterner()
+    columns, _ = profit_analysis.sandwich_profit_columns(sandwiches, interner)
+    columns = profit_analysis.compute_profit_columns(
+        columns, interner, prices, sol_price
+    )
+    return profit_analysis.summarize_profit_columns(columns, interner, sol_price)
+
+
+def benchmark_synthetic(
+    transactions: List[Dict[str, Any]], repeats: int = DEFAULT_REPEATS
+) -> Dict[str, Dict[str, Any]]:
+    results: Dict[str, Dict[str, Any]] = {}
+    swap_count = len(transactions)
+
+    timing = time_call(
+        lambda: sandwich_detect.detect_sandwiches(transactions), repeats
+    )
+    sandwiches = timing["result"]
+    results["detect_sandwiches"] = _entry(timing, swap_count, "swaps")
+
+    timing = time_call(
+        lambda: list(sandwich_detect.detect_sandwiches_streaming(transactions)),
+        repeats,
+    )
+    results["detect_sandwiches_streaming"] = _entry(timing, swap_count, "swaps")
+
+    mints = {tx["token_in"] for tx in transactions} | {
+        tx["token_out"] for tx in transactions
+    }
+    prices = {mint: 1.0 for mint in mints}
+    sol_price = prices[SOL_MINT] = 150.0
+
+    def profit_loop():
+        profits = [
+            profit_analysis.compute_profit(s, prices, sol_price, sid)
+            for sid, s in enumerate(sandwiches, start=1)
+        ]
+        return profit_analysis.summarize_results(profits, sol_price)
+
+    timing = time_call(profit_loop, repeats)
+    results["compute_profit+summarize_results"] = _entry(
+        timing, len(sandwiches), "sandwiches"
+    )
+    timing = time_call(
+        lambda: _profit_vectorized(sandwiches, prices, sol_price), repeats
+    )
+    results["compute_profit_columns"] = _entry(timing, len(sandwiches), "sandwiches")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tx_file = Path(tmp) / "transactions.json"
+        sandwich_file = Path(tmp) / "sandwich_attacks.json"
+
+        timing = time_call(
+            _quiet(lambda: save_transactions_to_file(transactions, tx_file)), repeats
+        )
+        results["save_transactions_json"] = _entry(timing, swap_count, "swaps")
+        timing = time_call(lambda: sandwich_detect.load_transactions(tx_file), repeats)
+        results["load_transactions_json"] = _entry(timing, swap_count, "swaps")
+
+        timing = time_call(
+            _quiet(
+                lambda: sandwich_detect.save_sandwich_results(sandwiches, sandwich_file)
+            ),
+            repeats,
+        )
+        results["save_sandwiches_json"] = _entry(timing, len(sandwiches), "sandwiches")
+        timing = time_call(
+            lambda: profit_analysis.load_sandwiches(sandwich_file), repeats
+        )
+        results["load_sandwiches_json"] = _entry(timing, len(sandwiches), "sandwiches")
+
+    return results
+
+
+def benchmark_block_parsing(
+    recordings_dir=replay.DEFAULT_RECORDINGS_DIR,
+    repeats: int = DEFAULT_REPEATS,
+    max_blocks: Optional[int] = None,
+) -> Optional[Dict[str, Any]]:
+    # Recordings are read up front so only decoding and swap extraction are
+    # timed. Returns None when there are no recordings.
+    if not Path(recordings_dir).is_dir():
+        return None
+    recordings = replay.list_recordings(recordings_dir)[:max_blocks]
+    if not recordings:
+        return None
+    blocks = [(slot, replay.read_recording(path)) for slot, path in recordings]
+    program_to_pool_mapping = {
+        pool["address"]: pool["name"] for pool in get_monitored_pools()
+    }
+
+    def parse_all():
+        swaps = 0
+        for slot, raw_block in blocks:
+            try:
+                block_data = utils.parse_block_response(raw_block)
+            except Exception:
+                continue
+            swaps += len(
+                utils.extract_swaps_from_block(
+                    block_data, slot, program_to_pool_mapping
+                )
+            )
+        return swaps
+
+    timing = time_call(parse_all, repeats)
+    entry = _entry(timing, len(blocks), "blocks")
+    entry["swaps_found"] = timing["result"]
+    entry["raw_bytes"] = sum(len(raw_block) for _, raw_block in blocks)
+    return entry
+
+
+def print_report(
+    results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]] = None
+) -> None:
+    previous = (baseline or {}).get("results", {})
+    print(f"\n{'Benchmark':<36}{'Best (s)':>12}{'Throughput':>22}{'vs base':>10}")
+    print("-" * 80)
+    for name, entry in results.items():
+        rate = entry["items_per_second"]
+        throughput = f"{rate:,.0f} {entry['unit']}/s" if rate else "-"
+        change = ""
+        base = previous.get(name)
+        if base and base.get("best_seconds"):
+            change = f"{(entry['best_seconds'] / base['best_seconds'] - 1) * 100:+.1f}%"
+        print(f"{name:<36}{entry['best_seconds']:>12.4f}{throughput:>22}{change:>10}")
+
+
+def run_benchmarks(
+    slots: int = DEFAULT_SLOTS,
+    swaps_per_slot: int = DEFAULT_SWAPS_PER_SLOT,
+    signers: int = DEFAULT_SIGNERS,
+    token_pairs: int = DEFAULT_TOKEN_PAIRS,
+    sandwiches: int = DEFAULT_SANDWICHES,
+    repeats: int = DEFAULT_REPEATS,
+    seed: int = DEFAULT_SEED,
+    recordings_dir=replay.DEFAULT_RECORDINGS_DIR,
+    output_file=DEFAULT_REPORT_FILE,
+    baseline_file=None,
+) -> Dict[str, Any]:
+    print("=" * 70)
+    print("PIPELINE BENCHMARKS")
+    print("=" * 70)
+
+    parameters = {
+        "slots": slots,
+        "swaps_per_slot": swaps_per_slot,
+        "signers": signers,
+        "token_pairs": token_pairs,
+        "injected_sandwiches": sandwiches,
+        "repeats": repeats,
+        "seed": seed,
+    }
+    started = time.perf_counter()
+    transactions = generate_swap_stream(
+        slots, swaps_per_slot, signers, token_pairs, sandwiches, seed
+    )
+    print(
+        f"\nGenerated {len(transactions)} swaps over {slots} slots "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+    results = benchmark_synthetic(transactions, repeats)
+    parsing = benchmark_block_parsing(recordings_dir, repeats)
+    if parsing is None:
+        print(f"No recorded blocks in {recordings_dir}; skipping block parsing")
+    else:
+        results["parse_recorded_blocks"] = parsing
+
+    baseline = None
+    if baseline_file:
+        with Path(baseline_file).open("r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "parameters": parameters,
+        "workload": {
+            "swaps": len(transactions),
+            "detected_sandwiches": results["compute_profit_columns"]["items"],
+        },
+        "results": results,
+    }
+    output_path = Path(output_file)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with output_path.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nBenchmark report saved to: {output_path.absolute()}\n")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the scan pipeline stages")
+    parser.add_argument("--slots", type=int, default=DEFAULT_SLOTS)
+    parser.add_argument("--swaps-per-slot", type=int, default=DEFAULT_SWAPS_PER_SLOT)
+    parser.add_argument("--signers", type=int, default=DEFAULT_SIGNERS)
+    parser.add_argument("--token-pairs", type=int, default=DEFAULT_TOKEN_PAIRS)
+    parser.add_argument("--sandwiches", type=int, default=DEFAULT_SANDWICHES)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument(
+        "--recordings-dir",
+        default=replay.DEFAULT_RECORDINGS_DIR,
+        help="Recorded getBlock responses to time block parsing on",
+    )
+    parser.add_argument("--output", default=DEFAULT_REPORT_FILE)
+    parser.add_argument(
+        "--baseline", default=None, help="Earlier report to compare timings with"
+    )
+    args = parser.parse_args()
+
+    run_benchmarks(
+        slots=args.slots,
+        swaps_per_slot=args.swaps_per_slot,
+        signers=args.signers,
+        token_pairs=args.token_pairs,
+        sandwiches=args.sandwiches,
+        repeats=args.repeats,
+        seed=args.seed,
+        recordings_dir=args.recordings_dir,
+        output_file=args.output,
+        baseline_file=args.baseline,
+    )
@@ -0,0 +1,115 @@
+import gzip
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+RESULTS_DIR = Path("results")
+DEFAULT_CACHE_DIR = RESULTS_DIR / "block_cache"
+DEFAULT_MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_FILE_SUFFIX = ".json.gz"
+
+
+class BlockCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # slot -> compressed size, least recently used first
+        self._entries: "OrderedDict[int, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def _path(self, slot: int) -> Path:
+        return self.cache_dir / f"{slot}{CACHE_FILE_SUFFIX}"
+
+    def _load_index(self) -> None:
+        files = []
+        for path in self.cache_dir.glob(f"*{CACHE_FILE_SUFFIX}"):
+            try:
+                slot = int(path.name[: -len(CACHE_FILE_SUFFIX)])
+                stat = path.stat()
+            except (ValueError, OSError):
+                continue
+            files.append((stat.st_mtime, slot, stat.st_size))
+
+        for _, slot, size in sorted(files):
+            self._entries[slot] = size
+            self._total_bytes += size
+
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            slot, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._path(slot).unlink()
+            except FileNotFoundError:
+                pass
+
+    def __contains__(self, slot: int) -> bool:
+        with self._lock:
+            return slot in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def slots(self) -> List[int]:
+        with self._lock:
+            return sorted(self._entries)
+
+    def get(self, slot: int) -> Optional[str]:
+        with self._lock:
+            if slot not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(slot)
+
+        path = self._path(slot)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                raw_block = f.read()
+            os.utime(path)
+        except (OSError, EOFError, ValueError, zlib.error):
+            # Truncated or corrupt files (including bad UTF-8) are dropped.
+            self.evict(slot)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return raw_block
+
+    def evict(self, slot: int) -> None:
+        with self._lock:
+            self._total_bytes -= self._entries.pop(slot, 0)
+        try:
+            self._path(slot).unlink()
+        except FileNotFoundError:
+            pass
+
+    def put(self, slot: int, raw_block: str) -> None:
+        path = self._path(slot)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(raw_block)
+        tmp_path.replace(path)
+        size = path.stat().st_size
+
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(slot, 0)
+            self._entries[slot] = size
+            self._evict()
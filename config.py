@@ -10,6 +10,12 @@ HELIUS_API_KEY = os.getenv("HELIUS_API_KEY", None)
 if HELIUS_API_KEY:
     RPC_ENDPOINT = f"https://mainnet.helius-rpc.com/?api-key={HELIUS_API_KEY}"
 
+# Comma-separated list of RPC URLs to spread block requests across; defaults
+# to RPC_ENDPOINT alone.
+RPC_ENDPOINTS = [
+    url.strip() for url in os.getenv("RPC_ENDPOINTS", "").split(",") if url.strip()
+] or [RPC_ENDPOINT]
+
 
 ANALYSIS_WINDOW_SECONDS = 7 * 24 * 60 * 60
 
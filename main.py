@@ -5,24 +5,41 @@ Scans recent Solana blockchain blocks to identify and extract swap transactions
 from configured DEX pools (Raydium and Orca).
 """
 
+import argparse
 import asyncio
 import json
+import time
+from concurrent.futures import Executor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import config
-from solana.rpc.async_api import AsyncClient
+import metrics
+from block_cache import BlockCache
+from pnl_ledger import PnlLedger
+from swap_db import DEFAULT_DB_FILE, SwapDatabase
+from rpc_pool import RpcPool, create_rpc_client, endpoint_label
 import sandwich_detect
 
 import utils
 import profit_analysis
+import simulation
+import swap_store
 
 
 DEFAULT_SLOT_WINDOW = 300
 RESULTS_DIR = Path("results")
 RESULTS_DIR.mkdir(exist_ok=True)
 OUTPUT_FILENAME = RESULTS_DIR / "transactions.json"
+# Follow mode appends here; one-shot --output-format jsonl rewrites
+# transactions.jsonl, so the two never share a file.
+STREAMED_TRANSACTIONS_FILENAME = RESULTS_DIR / "transactions_stream.jsonl"
+SANDWICH_OUTPUT_FILENAME = RESULTS_DIR / "sandwich_attacks.json"
+STREAMED_SANDWICHES_FILENAME = RESULTS_DIR / "sandwich_attacks.jsonl"
+SCANNER_STATE_FILENAME = RESULTS_DIR / "scanner_state.json"
+FOLLOW_SAVE_INTERVAL_SECONDS = 60
+OUTPUT_FORMATS = ("json", "jsonl", "npz", "sqlite")
 
 
 def get_monitored_pools() -> List[Dict[str, str]]:
@@ -50,42 +67,67 @@ def get_monitored_pools() -> List[Dict[str, str]]:
     ]
 
 
-def calculate_pool_statistics(
-    transactions: List[Dict[str, Any]], pool_configurations: List[Dict[str, str]]
-) -> Dict[str, int]:
-    pool_transaction_counts = {}
-
-    for pool_config in pool_configurations:
-        pool_name = pool_config["name"]
-        transaction_count = sum(
-            1 for tx in transactions if tx["pool_name"] == pool_name
-        )
-        pool_transaction_counts[pool_name] = transaction_count
-
-    return pool_transaction_counts
+def count_pool_transactions(
+    pool_transaction_counts: Dict[str, int], transactions: List[Dict[str, Any]]
+) -> None:
+    # Updated slot by slot so the breakdown never needs the whole scan.
+    for tx in transactions:
+        pool_name = tx["pool_name"]
+        pool_transaction_counts[pool_name] = pool_transaction_counts.get(pool_name, 0) + 1
 
 
 def print_scan_results(
-    transactions: List[Dict[str, Any]], pool_configurations: List[Dict[str, str]]
+    transaction_count: int,
+    pool_transaction_counts: Dict[str, int],
+    pool_configurations: List[Dict[str, str]],
 ) -> None:
     print("\n" + "=" * 70)
     print("SCAN RESULTS")
     print("=" * 70)
 
-    if not transactions:
+    if not transaction_count:
         print("\nNo swap transactions found in the scanned blocks.")
         return
 
-    pool_statistics = calculate_pool_statistics(transactions, pool_configurations)
-
-    print(f"\nTotal transactions found: {len(transactions)}")
+    print(f"\nTotal transactions found: {transaction_count}")
     print("\nBreakdown by pool:")
 
-    for pool_name, count in pool_statistics.items():
-        percentage = (count / len(transactions) * 100) if transactions else 0
+    for pool_config in pool_configurations:
+        pool_name = pool_config["name"]
+        count = pool_transaction_counts.get(pool_name, 0)
+        percentage = count / transaction_count * 100
         print(f"  - {pool_name}: {count} transactions ({percentage:.1f}%)")
 
 
+def print_rpc_connection(rpc_endpoints: List[str]) -> None:
+    if len(rpc_endpoints) == 1:
+        print(f"\nConnected to RPC: {rpc_endpoints[0]}")
+        return
+    print(f"\nConnected to {len(rpc_endpoints)} RPC endpoints:")
+    for url in rpc_endpoints:
+        print(f"  - {endpoint_label(url)}")
+
+
+def print_live_sandwich(slot: int, sandwich: Dict[str, Any]) -> None:
+    metadata = sandwich["attack_metadata"]
+    print(
+        f"  [slot {slot}] Sandwich: bot {metadata['bot_wallet'][:12]}... "
+        f"victim {metadata['victim_wallet'][:12]}... "
+        f"(span {metadata['slot_gap_front_to_backrun']} slots)"
+    )
+
+
+def detect_slot(
+    detector: sandwich_detect.StreamingSandwichDetector,
+    slot: int,
+    swaps: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    with metrics.DETECTION_SECONDS.time():
+        found = detector.process_slot(slot, swaps)
+    metrics.SANDWICHES_DETECTED.inc(len(found))
+    return found
+
+
 def save_transactions_to_file(
     transactions: List[Dict[str, Any]], output_filepath=OUTPUT_FILENAME
 ) -> None:
@@ -103,9 +145,58 @@ def save_transactions_to_file(
     print(f"\nResults saved to: {output_path.absolute()}")
 
 
-async def run_blockchain_scanner(slot_window: int = DEFAULT_SLOT_WINDOW) -> None:
-    rpc_endpoint = config.RPC_ENDPOINT
-    if not rpc_endpoint:
+class JsonlWriter:
+    def __init__(self, output_filepath, append: bool = False):
+        self.path = Path(output_filepath)
+        self.count = 0
+        self._file = self.path.open("a" if append else "w", encoding="utf-8")
+
+    def write_many(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            self._file.write(json.dumps(record, default=str))
+            self._file.write("\n")
+        self.count += len(records)
+        # Flush per batch so a crash only loses the slot in progress.
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def save_scan_results_npz(
+    transactions: List[Dict[str, Any]],
+    sandwiches: List[Dict[str, Any]],
+    transactions_filepath,
+    sandwiches_filepath,
+) -> None:
+    store = swap_store.SwapStore.from_records(transactions)
+    swap_store.save_store_npz(transactions_filepath, store)
+    print(f"\nResults saved to: {Path(transactions_filepath).absolute()}")
+
+    legs = sandwich_detect.sandwich_legs_in_store(store, sandwiches)
+    sandwich_detect.save_sandwich_results_npz(store, legs, sandwiches_filepath)
+
+
+async def run_blockchain_scanner(
+    slot_window: int = DEFAULT_SLOT_WINDOW,
+    end_slot: Optional[int] = None,
+    block_cache: Optional[BlockCache] = None,
+    parser_pool: Optional[Executor] = None,
+    max_concurrent_requests: int = utils.MAX_CONCURRENT_BLOCK_REQUESTS,
+    output_format: str = "json",
+    metrics_file=None,
+    max_batch_size: int = 0,
+    rpc_endpoints: Optional[List[str]] = None,
+    block_encoding: str = utils.DEFAULT_BLOCK_ENCODING,
+) -> None:
+    rpc_endpoints = rpc_endpoints or config.RPC_ENDPOINTS
+    if not rpc_endpoints:
         print("ERROR: RPC_ENDPOINT not configured. Please check your .env file.")
         return
 
@@ -113,14 +204,23 @@ async def run_blockchain_scanner(slot_window: int = DEFAULT_SLOT_WINDOW) -> None
     print("SOLANA DEX TRANSACTION SCANNER")
     print("=" * 70)
 
-    async with AsyncClient(rpc_endpoint) as rpc_client:
+    # JSONL only applies to the transactions stream; later stages stay JSON.
+    results_format = "json" if output_format == "jsonl" else output_format
+    transactions_file = OUTPUT_FILENAME.with_suffix(f".{output_format}")
+    sandwich_file = SANDWICH_OUTPUT_FILENAME.with_suffix(f".{results_format}")
+    analysis_file = (RESULTS_DIR / "profit_analysis").with_suffix(f".{results_format}")
+    if output_format == "sqlite":
+        # Every stage reads and writes the same database.
+        transactions_file = sandwich_file = analysis_file = DEFAULT_DB_FILE
+
+    async with create_rpc_client(rpc_endpoints) as rpc_client:
         is_connected = await rpc_client.is_connected()
 
         if not is_connected:
             print("ERROR: Failed to connect to Solana RPC endpoint")
             return
 
-        print(f"\nConnected to RPC: {rpc_endpoint}")
+        print_rpc_connection(rpc_endpoints)
 
         monitored_pools = get_monitored_pools()
 
@@ -128,26 +228,86 @@ async def run_blockchain_scanner(slot_window: int = DEFAULT_SLOT_WINDOW) -> None
         for pool in monitored_pools:
             print(f"  - {pool['name']}")
 
-        # Scan blockchain for swap transactions
-        discovered_transactions = await utils.parse_blocks_for_txns(
-            rpc_client, monitored_pools, slot_window=slot_window
+        # Scan blockchain for swap transactions, detecting sandwiches as each
+        # slot completes instead of after the whole window is written out
+        detector = sandwich_detect.StreamingSandwichDetector()
+        detected_sandwiches: List[Dict[str, Any]] = []
+        writer = JsonlWriter(transactions_file) if output_format == "jsonl" else None
+        db = SwapDatabase(transactions_file) if output_format == "sqlite" else None
+        # Range of slots this scan covered, so profit analysis reads only its
+        # own sandwiches back from the database.
+        scanned_slots: List[int] = []
+        pool_transaction_counts: Dict[str, int] = {}
+        # Only the JSON and npz outputs need every swap at the end; JSONL and
+        # SQLite have already written each slot out by then.
+        discovered_transactions: Optional[List[Dict[str, Any]]] = (
+            [] if output_format in ("json", "npz") else None
         )
 
-        print_scan_results(discovered_transactions, monitored_pools)
-
-        if discovered_transactions:
-            save_transactions_to_file(discovered_transactions)
+        def on_slot(slot: int, swaps: List[Dict[str, Any]]) -> None:
+            count_pool_transactions(pool_transaction_counts, swaps)
+            if discovered_transactions is not None:
+                discovered_transactions.extend(swaps)
+            if not scanned_slots:
+                scanned_slots.extend((slot, slot))
+            scanned_slots[0] = min(scanned_slots[0], slot)
+            scanned_slots[1] = max(scanned_slots[1], slot)
+            if writer:
+                writer.write_many(swaps)
+            if db is not None:
+                db.insert_swaps(swaps)
+            found = detect_slot(detector, slot, swaps)
+            for sandwich in found:
+                print_live_sandwich(slot, sandwich)
+                detected_sandwiches.append(sandwich)
+            if db is not None and found:
+                db.insert_sandwiches(found)
+
+        try:
+            transaction_count = await utils.parse_blocks_for_txns(
+                rpc_client,
+                monitored_pools,
+                slot_window=slot_window,
+                on_slot=on_slot,
+                block_cache=block_cache,
+                end_slot=end_slot,
+                parser_pool=parser_pool,
+                max_concurrent_requests=max_concurrent_requests,
+                max_batch_size=max_batch_size,
+                block_encoding=block_encoding,
+            )
+        finally:
+            if writer:
+                writer.close()
+                print(f"\nStreamed {writer.count} transactions to: {writer.path.absolute()}")
+            if db is not None:
+                db.close()
+                print(f"\nStored swaps and sandwiches in: {db.path.absolute()}")
+
+        print_scan_results(transaction_count, pool_transaction_counts, monitored_pools)
+
+        if transaction_count:
+            if output_format == "json":
+                save_transactions_to_file(discovered_transactions, transactions_file)
 
-            # Run sandwich detection
             print("\n" + "=" * 70)
-            print("Running Wide Sandwich Detection")
+            print("Wide Sandwich Detection")
             print("=" * 70)
 
             try:
-                sandwich_detect.run_detection(
-                    transactions_file=OUTPUT_FILENAME,
-                    output_file=RESULTS_DIR / "sandwich_attacks.json",
-                )
+                if output_format == "sqlite":
+                    print(f"Stored {len(detected_sandwiches)} sandwiches")
+                elif output_format == "npz":
+                    save_scan_results_npz(
+                        discovered_transactions,
+                        detected_sandwiches,
+                        transactions_file,
+                        sandwich_file,
+                    )
+                else:
+                    sandwich_detect.save_sandwich_results(
+                        detected_sandwiches, sandwich_file
+                    )
             except Exception as e:
                 print(f"Error during sandwich detection: {e}")
             else:
@@ -155,23 +315,269 @@ async def run_blockchain_scanner(slot_window: int = DEFAULT_SLOT_WINDOW) -> None
                 print("Running SOL Profit Analysis")
                 print("=" * 70)
                 try:
-                    profit_analysis.run_profit_analysis(
-                        RESULTS_DIR / "sandwich_attacks.json",
-                        RESULTS_DIR / "profit_analysis.json",
+                    await profit_analysis.run_profit_analysis_async(
+                        sandwich_file,
+                        analysis_file,
                         RESULTS_DIR / "pnl_report_per_bot.json",
+                        ledger=PnlLedger(),
+                        slot_range=tuple(scanned_slots) or None,
                     )
                 except Exception as e:
                     print(f"Error during profit analysis: {e}")
 
+                try:
+                    simulation.run_victim_loss_replay(detected_sandwiches)
+                except Exception as e:
+                    print(f"Error during victim loss replay: {e}")
+
+        metrics.print_stage_summary()
+        if isinstance(rpc_client, RpcPool):
+            rpc_client.print_health_summary()
+        if metrics_file:
+            print(f"\nMetrics written to: {metrics.write_metrics_file(metrics_file)}")
+
         print("\n" + "=" * 70)
         print("Scan complete")
         print("=" * 70 + "\n")
 
 
-try:
-    asyncio.run(run_blockchain_scanner())
-except KeyboardInterrupt:
-    print("\n\nScan interrupted by user")
-except Exception as error:
-    print(f"\nERROR: {error}")
-    raise
+async def run_tip_follower(
+    start_slot: Optional[int] = None,
+    block_cache: Optional[BlockCache] = None,
+    parser_pool: Optional[Executor] = None,
+    max_concurrent_requests: int = utils.MAX_CONCURRENT_BLOCK_REQUESTS,
+    metrics_file=None,
+    max_batch_size: int = 0,
+    rpc_endpoints: Optional[List[str]] = None,
+    block_encoding: str = utils.DEFAULT_BLOCK_ENCODING,
+) -> None:
+    rpc_endpoints = rpc_endpoints or config.RPC_ENDPOINTS
+    if not rpc_endpoints:
+        print("ERROR: RPC_ENDPOINT not configured. Please check your .env file.")
+        return
+
+    print("=" * 70)
+    print("SOLANA DEX TRANSACTION SCANNER (FOLLOWING CHAIN TIP)")
+    print("=" * 70)
+
+    async with create_rpc_client(rpc_endpoints) as rpc_client:
+        if not await rpc_client.is_connected():
+            print("ERROR: Failed to connect to Solana RPC endpoint")
+            return
+
+        print_rpc_connection(rpc_endpoints)
+
+        monitored_pools = get_monitored_pools()
+        detector = sandwich_detect.StreamingSandwichDetector()
+        # Only sandwiches found since the last flush are held in memory; the
+        # rest are already appended to the JSONL file.
+        unsaved_sandwiches: List[Dict[str, Any]] = []
+        last_saved_at = time.monotonic()
+        writer = JsonlWriter(STREAMED_TRANSACTIONS_FILENAME, append=True)
+        sandwich_writer = JsonlWriter(STREAMED_SANDWICHES_FILENAME, append=True)
+        print(f"Appending transactions to: {writer.path.absolute()}")
+        print(f"Appending sandwiches to: {sandwich_writer.path.absolute()}")
+
+        def save_unsaved_sandwiches() -> None:
+            sandwich_writer.write_many(unsaved_sandwiches)
+            print(
+                f"  Saved {len(unsaved_sandwiches)} sandwiches "
+                f"({sandwich_writer.count} this run)"
+            )
+            unsaved_sandwiches.clear()
+
+        def on_slot(slot: int, swaps: List[Dict[str, Any]]) -> None:
+            writer.write_many(swaps)
+            for sandwich in detect_slot(detector, slot, swaps):
+                print_live_sandwich(slot, sandwich)
+                unsaved_sandwiches.append(sandwich)
+
+        try:
+            async for progress in utils.follow_chain_tip(
+                rpc_client,
+                monitored_pools,
+                on_slot=on_slot,
+                state_file=SCANNER_STATE_FILENAME,
+                start_slot=start_slot,
+                block_cache=block_cache,
+                parser_pool=parser_pool,
+                max_concurrent_requests=max_concurrent_requests,
+                max_batch_size=max_batch_size,
+                block_encoding=block_encoding,
+            ):
+                if progress["slots_behind"] > 0:
+                    print(
+                        f"  Caught up to slot {progress['last_processed_slot']} "
+                        f"({progress['slots_behind']} slots behind tip)"
+                    )
+                if progress["failed_slots"]:
+                    print(
+                        f"  Failed to fetch {len(progress['failed_slots'])} blocks: "
+                        f"{progress['failed_slots']} (holding back "
+                        f"{progress['held_slots']} later slots until they are retried)"
+                    )
+                if progress["abandoned_slots"]:
+                    print(
+                        f"  Giving up on {len(progress['abandoned_slots'])} blocks after "
+                        f"{utils.MAX_FOLLOW_SLOT_RETRIES} attempts: "
+                        f"{progress['abandoned_slots']}"
+                    )
+
+                if (
+                    unsaved_sandwiches
+                    and time.monotonic() - last_saved_at >= FOLLOW_SAVE_INTERVAL_SECONDS
+                ):
+                    save_unsaved_sandwiches()
+                    last_saved_at = time.monotonic()
+
+                if metrics_file:
+                    metrics.write_metrics_file(metrics_file)
+        finally:
+            writer.close()
+            if unsaved_sandwiches:
+                save_unsaved_sandwiches()
+            sandwich_writer.close()
+            if metrics_file:
+                metrics.write_metrics_file(metrics_file)
+            if isinstance(rpc_client, RpcPool):
+                rpc_client.print_health_summary()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Solana DEX transaction scanner")
+    parser.add_argument(
+        "--slot-window",
+        type=int,
+        default=DEFAULT_SLOT_WINDOW,
+        help="Number of recent slots to scan (one-shot mode)",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep running and follow the chain tip until interrupted",
+    )
+    parser.add_argument(
+        "--start-slot",
+        type=int,
+        default=None,
+        help="Slot to start following from (defaults to the saved scanner state)",
+    )
+    parser.add_argument(
+        "--end-slot",
+        type=int,
+        default=None,
+        help="Last slot of the one-shot scan window (defaults to the current slot)",
+    )
+    parser.add_argument(
+        "--no-block-cache",
+        action="store_true",
+        help="Always fetch blocks from RPC instead of the on-disk block cache",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=OUTPUT_FORMATS,
+        default="json",
+        help="Write results as JSON, stream transactions as JSONL while scanning, "
+        "write NumPy .npz columns, or store every stage in results/mev.sqlite3",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=utils.MAX_CONCURRENT_BLOCK_REQUESTS,
+        help="Maximum number of in-flight get_block requests",
+    )
+    parser.add_argument(
+        "--parser-workers",
+        type=int,
+        default=0,
+        help="Parse blocks in a pool of N worker processes (0 = in-process)",
+    )
+    parser.add_argument(
+        "--rpc-batch-size",
+        type=int,
+        default=0,
+        help="Pack up to N getBlock calls into each JSON-RPC batch request, "
+        "adapting to latency and errors, and skip slots getBlocks reports as "
+        "empty (0 = one request per block)",
+    )
+    parser.add_argument(
+        "--block-encoding",
+        choices=utils.BLOCK_ENCODINGS,
+        default=utils.DEFAULT_BLOCK_ENCODING,
+        help="Transaction encoding requested from getBlock; base64 responses "
+        "are smaller and faster to decode (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rpc-endpoints",
+        nargs="+",
+        metavar="URL",
+        help="RPC endpoints to spread block requests across, routed by recent "
+        "latency and errors with failover and hedging (default: RPC_ENDPOINTS "
+        "from the environment)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        nargs="?",
+        const=metrics.DEFAULT_METRICS_FILE,
+        default=None,
+        help="Write Prometheus metrics to a file at the end of a scan, or after "
+        "every catch-up batch when following (default: results/metrics.prom)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    block_cache = None if args.no_block_cache else BlockCache()
+    parser_pool = (
+        utils.create_parser_pool(args.parser_workers) if args.parser_workers else None
+    )
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port)
+        print(
+            f"Serving metrics on http://{metrics.DEFAULT_METRICS_HOST}:"
+            f"{args.metrics_port}/metrics"
+        )
+    try:
+        if args.follow:
+            asyncio.run(
+                run_tip_follower(
+                    start_slot=args.start_slot,
+                    block_cache=block_cache,
+                    parser_pool=parser_pool,
+                    max_concurrent_requests=args.max_concurrency,
+                    metrics_file=args.metrics_file,
+                    max_batch_size=args.rpc_batch_size,
+                    rpc_endpoints=args.rpc_endpoints,
+                    block_encoding=args.block_encoding,
+                )
+            )
+        else:
+            asyncio.run(
+                run_blockchain_scanner(
+                    slot_window=args.slot_window,
+                    end_slot=args.end_slot,
+                    block_cache=block_cache,
+                    parser_pool=parser_pool,
+                    max_concurrent_requests=args.max_concurrency,
+                    output_format=args.output_format,
+                    metrics_file=args.metrics_file,
+                    max_batch_size=args.rpc_batch_size,
+                    rpc_endpoints=args.rpc_endpoints,
+                    block_encoding=args.block_encoding,
+                )
+            )
+    except KeyboardInterrupt:
+        print("\n\nScan interrupted by user")
+    except Exception as error:
+        print(f"\nERROR: {error}")
+        raise
+    finally:
+        if parser_pool is not None:
+            parser_pool.shutdown(cancel_futures=True)
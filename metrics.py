@@ -0,0 +1,343 @@
+"""
+Pipeline Metrics
+
+Counters and latency histograms for each pipeline stage, rendered in the
+Prometheus text exposition format. Serve them from a local HTTP endpoint
+with start_http_server() or dump them with write_metrics_file().
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+RESULTS_DIR = Path("results")
+DEFAULT_METRICS_FILE = RESULTS_DIR / "metrics.prom"
+DEFAULT_METRICS_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_LATENCY_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.01,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape_label(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.exposed_name = f"{name}_total"
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def by_label(self, labelname: str) -> Dict[str, float]:
+        index = self.labelnames.index(labelname)
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for key, value in self._values.items():
+                totals[key[index]] = totals.get(key[index], 0) + value
+        return totals
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.exposed_name}{_format_labels(self.labelnames, key)} "
+            f"{_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ):
+        self.name = name
+        self.exposed_name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def observe(self, value: float, count: int = 1, **labels: str) -> None:
+        # count > 1 records the same value several times, e.g. a per-item
+        # average over a batch.
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += count
+            series[1] += value * count
+            series[2] += count
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def total(self, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[1] if series else 0.0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total, count))
+                for key, (counts, total, count) in self._series.items()
+            )
+        lines = []
+        bucket_names = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(bucket_names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        labelnames: Sequence[str] = (),
+    ):
+        return self.register(Histogram(name, help_text, buckets, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.exposed_name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.exposed_name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+BLOCK_FETCH_SECONDS = REGISTRY.histogram(
+    "mev_block_fetch_seconds", "Time to fetch one getBlock response from the RPC"
+)
+BLOCK_BATCH_SIZE = REGISTRY.histogram(
+    "mev_block_batch_size",
+    "getBlock calls per batched JSON-RPC request",
+    (1, 2, 4, 8, 16, 32, 64),
+)
+RPC_REQUEST_SECONDS = REGISTRY.histogram(
+    "mev_rpc_request_seconds",
+    "Latency of successful pooled RPC requests, by endpoint",
+    labelnames=["endpoint"],
+)
+RPC_REQUESTS = REGISTRY.counter(
+    "mev_rpc_requests",
+    "Pooled RPC requests, by endpoint and outcome (ok, error, cancelled)",
+    ["endpoint", "outcome"],
+)
+RPC_HEDGED_REQUESTS = REGISTRY.counter(
+    "mev_rpc_hedged_requests", "Requests hedged to a second endpoint"
+)
+RPC_CIRCUIT_OPENED = REGISTRY.counter(
+    "mev_rpc_circuit_opened",
+    "Times an endpoint's circuit breaker opened, by endpoint",
+    ["endpoint"],
+)
+BLOCK_SOURCE = REGISTRY.counter(
+    "mev_blocks_loaded", "Blocks loaded, by source (rpc or cache)", ["source"]
+)
+BLOCK_PARSE_SECONDS = REGISTRY.histogram(
+    "mev_block_parse_seconds", "Time to decode a block and extract its swaps"
+)
+TRANSACTION_PARSE_SECONDS = REGISTRY.histogram(
+    "mev_transaction_parse_seconds",
+    "Average parse time per transaction of each block",
+    FAST_LATENCY_BUCKETS,
+)
+TRANSACTIONS_PARSED = REGISTRY.counter(
+    "mev_transactions_parsed", "Transactions examined for swaps"
+)
+TRANSACTIONS_REJECTED = REGISTRY.counter(
+    "mev_transactions_rejected",
+    "Transactions that did not yield a swap record, by reason",
+    ["reason"],
+)
+SWAPS_EXTRACTED = REGISTRY.counter("mev_swaps_extracted", "Swap records extracted")
+SLOTS_FAILED = REGISTRY.counter(
+    "mev_slots_failed",
+    "Slots that produced no block, by reason (skipped, fetch_error, parse_error)",
+    ["reason"],
+)
+DETECTION_SECONDS = REGISTRY.histogram(
+    "mev_detection_seconds", "Sandwich detection time per slot"
+)
+SANDWICHES_DETECTED = REGISTRY.counter(
+    "mev_sandwiches_detected", "Sandwiches detected"
+)
+PRICE_FETCH_SECONDS = REGISTRY.histogram(
+    "mev_price_fetch_seconds", "Time per price API request, including failures"
+)
+PRICE_REQUESTS = REGISTRY.counter(
+    "mev_price_requests",
+    "Price API requests, by outcome (ok, retried, failed)",
+    ["outcome"],
+)
+
+
+def record_rejections(rejections: Dict[str, int]) -> None:
+    for reason, count in rejections.items():
+        TRANSACTIONS_REJECTED.inc(count, reason=reason)
+
+
+def write_metrics_file(
+    path=DEFAULT_METRICS_FILE, registry: MetricsRegistry = REGISTRY
+) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(registry.render(), encoding="utf-8")
+    tmp_path.replace(path)
+    return path
+
+
+def start_http_server(
+    port: int,
+    host: str = DEFAULT_METRICS_HOST,
+    registry: MetricsRegistry = REGISTRY,
+) -> ThreadingHTTPServer:
+    # Serves GET /metrics from a daemon thread; call shutdown() to stop.
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def print_stage_summary() -> None:
+    # Where the time went, from the default registry.
+    rows = [
+        ("RPC fetch", BLOCK_FETCH_SECONDS),
+        ("Block parse", BLOCK_PARSE_SECONDS),
+        ("Detection", DETECTION_SECONDS),
+        ("Price fetch", PRICE_FETCH_SECONDS),
+    ]
+    print("\n STAGE TIMINGS")
+    print("-" * 70)
+    for label, histogram in rows:
+        count = histogram.count()
+        total = histogram.total()
+        mean_ms = total / count * 1000 if count else 0.0
+        print(
+            f"  {label:<12} {total:>9.2f}s total {count:>8} calls "
+            f"{mean_ms:>9.2f} ms avg"
+        )
+    for label, counter in (
+        ("Failed slots", SLOTS_FAILED),
+        ("Rejected txs", TRANSACTIONS_REJECTED),
+    ):
+        counts = counter.by_label("reason")
+        if counts:
+            breakdown = ", ".join(
+                f"{reason}: {int(count)}" for reason, count in sorted(counts.items())
+            )
+            print(f"  {label:<12} {breakdown}")
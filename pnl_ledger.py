@@ -0,0 +1,260 @@
+"""
+Persistent PnL Ledger
+
+Append-only record of analyzed sandwiches, partitioned by UTC day under
+results/pnl_ledger/days/<YYYY-MM-DD>.jsonl, with per-bot per-day totals kept
+in results/pnl_ledger/summary.json. Sandwiches are deduplicated by their
+(front_run, victim, back_run) signature triple, so re-analyzing the same
+sandwich file adds nothing. Window queries read only the summary.
+"""
+
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+
+RESULTS_DIR = Path("results")
+DEFAULT_LEDGER_DIR = RESULTS_DIR / "pnl_ledger"
+DAYS_DIRNAME = "days"
+SUMMARY_FILENAME = "summary.json"
+DAY_FORMAT = "%Y-%m-%d"
+DEFAULT_TOP_BOTS = 10
+
+
+def day_of(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(DAY_FORMAT)
+
+
+def signature_key(entry: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+    key = (
+        entry.get("front_run_signature"),
+        entry.get("victim_signature"),
+        entry.get("back_run_signature"),
+    )
+    return key if all(key) else None
+
+
+class PnlLedger:
+    def __init__(self, ledger_dir=DEFAULT_LEDGER_DIR):
+        self.ledger_dir = Path(ledger_dir)
+        self.days_dir = self.ledger_dir / DAYS_DIRNAME
+        self.summary_path = self.ledger_dir / SUMMARY_FILENAME
+        self.days_dir.mkdir(parents=True, exist_ok=True)
+
+        # day -> bot -> {"count", "profit_usd", "profit_sol"}
+        self.days: Dict[str, Dict[str, Dict[str, float]]] = {}
+        # day -> size of its day file when the totals were last saved
+        self.day_bytes: Dict[str, int] = {}
+        # Signature triples per day, loaded only for days a merge touches.
+        self._seen: Dict[str, Set[Tuple[str, str, str]]] = {}
+        self._load_summary()
+
+    def _day_path(self, day: str) -> Path:
+        return self.days_dir / f"{day}.jsonl"
+
+    def _read_day(self, day: str) -> Iterable[Dict[str, Any]]:
+        path = self._day_path(day)
+        if not path.exists():
+            return
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A partially written trailing line from an interrupted run.
+                    continue
+
+    def _load_summary(self) -> None:
+        try:
+            with self.summary_path.open("r", encoding="utf-8") as f:
+                summary = json.load(f)
+            self.days = summary.get("days", {})
+            self.day_bytes = summary.get("day_bytes", {})
+        except (OSError, ValueError):
+            self.days = {}
+            self.day_bytes = {}
+
+        # Day files are the source of truth; rebuild any day whose file
+        # changed since its totals were saved, e.g. after a crash between
+        # the append and the summary write.
+        stale = [
+            path.stem
+            for path in sorted(self.days_dir.glob("*.jsonl"))
+            if self.day_bytes.get(path.stem) != path.stat().st_size
+        ]
+        for day in stale:
+            self._rebuild_day(day)
+        if stale:
+            self._save_summary()
+
+    def _rebuild_day(self, day: str) -> None:
+        totals = defaultdict(lambda: {"count": 0, "profit_usd": 0.0, "profit_sol": 0.0})
+        seen = set()
+        for entry in self._read_day(day):
+            key = signature_key(entry)
+            if key in seen:
+                continue
+            seen.add(key)
+            row = totals[entry["bot"]]
+            row["count"] += 1
+            row["profit_usd"] += entry["profit_usd"]
+            row["profit_sol"] += entry["profit_sol"]
+        self.days[day] = dict(totals)
+        self.day_bytes[day] = self._day_path(day).stat().st_size
+        self._seen[day] = seen
+
+    def _seen_for(self, day: str) -> Set[Tuple[str, str, str]]:
+        seen = self._seen.get(day)
+        if seen is None:
+            seen = {signature_key(entry) for entry in self._read_day(day)}
+            self._seen[day] = seen
+        return seen
+
+    def _save_summary(self) -> None:
+        tmp_path = self.summary_path.with_suffix(".json.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({"days": self.days, "day_bytes": self.day_bytes}, f)
+        tmp_path.replace(self.summary_path)
+
+    def merge(self, entries: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        # Entries without a block time are skipped: booking them on the day
+        # of the merge would let a later re-merge count them again, since
+        # duplicates are only looked up in the day an entry belongs to.
+        stats = {"added": 0, "duplicates": 0, "unkeyed": 0, "undated": 0}
+        new_by_day: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+        for entry in entries:
+            key = signature_key(entry)
+            if key is None:
+                stats["unkeyed"] += 1
+                continue
+            block_time = entry.get("block_time")
+            if not block_time or block_time <= 0:
+                stats["undated"] += 1
+                continue
+            day = day_of(block_time)
+            seen = self._seen_for(day)
+            if key in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(key)
+            new_by_day[day].append(entry)
+
+        for day, day_entries in new_by_day.items():
+            day_path = self._day_path(day)
+            with day_path.open("a", encoding="utf-8") as f:
+                for entry in day_entries:
+                    f.write(json.dumps(entry) + "\n")
+            self.day_bytes[day] = day_path.stat().st_size
+
+            bots = self.days.setdefault(day, {})
+            for entry in day_entries:
+                row = bots.setdefault(
+                    entry["bot"], {"count": 0, "profit_usd": 0.0, "profit_sol": 0.0}
+                )
+                row["count"] += 1
+                row["profit_usd"] += entry["profit_usd"]
+                row["profit_sol"] += entry["profit_sol"]
+            stats["added"] += len(day_entries)
+
+        if new_by_day:
+            self._save_summary()
+        return stats
+
+    def days_in_window(
+        self,
+        window_seconds: float = config.ANALYSIS_WINDOW_SECONDS,
+        now: Optional[float] = None,
+    ) -> List[str]:
+        # Whole UTC days overlapping [now - window, now].
+        now = time.time() if now is None else now
+        first_day = day_of(now - window_seconds)
+        last_day = day_of(now)
+        return sorted(day for day in self.days if first_day <= day <= last_day)
+
+    def bot_totals(
+        self,
+        window_seconds: float = config.ANALYSIS_WINDOW_SECONDS,
+        now: Optional[float] = None,
+    ) -> Dict[str, Dict[str, float]]:
+        totals = defaultdict(lambda: {"count": 0, "profit_usd": 0.0, "profit_sol": 0.0})
+        for day in self.days_in_window(window_seconds, now):
+            for bot, row in self.days[day].items():
+                total = totals[bot]
+                total["count"] += row["count"]
+                total["profit_usd"] += row["profit_usd"]
+                total["profit_sol"] += row["profit_sol"]
+        return dict(totals)
+
+    def top_bots(
+        self,
+        n: int = DEFAULT_TOP_BOTS,
+        window_seconds: float = config.ANALYSIS_WINDOW_SECONDS,
+        now: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        return sorted(
+            (
+                {
+                    "bot": bot,
+                    "sandwich_count": row["count"],
+                    "profit_usd": row["profit_usd"],
+                    "profit_sol": row["profit_sol"],
+                }
+                for bot, row in self.bot_totals(window_seconds, now).items()
+            ),
+            key=lambda row: row["profit_usd"],
+            reverse=True,
+        )[:n]
+
+    def bot_daily(self, bot: str) -> Dict[str, Dict[str, float]]:
+        return {
+            day: bots[bot] for day, bots in sorted(self.days.items()) if bot in bots
+        }
+
+
+def print_top_bots(rows: List[Dict[str, Any]], window_seconds: float) -> None:
+    days = timedelta(seconds=window_seconds).days
+    print(f"\n TOP BOTS OVER THE LAST {days} DAYS (ledger)")
+    print("-" * 70)
+    if not rows:
+        print("  No sandwiches recorded in this window")
+    for i, row in enumerate(rows, 1):
+        print(f"  #{i} {row['bot'][:20]}...")
+        print(
+            f"     Profit: ${row['profit_usd']:,.2f} USD ({row['profit_sol']:.6f} SOL)"
+        )
+        print(f"     Sandwiches: {row['sandwich_count']}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Query the persistent PnL ledger")
+    parser.add_argument("--ledger-dir", default=DEFAULT_LEDGER_DIR)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_BOTS)
+    parser.add_argument(
+        "--days",
+        type=float,
+        default=config.ANALYSIS_WINDOW_SECONDS / 86400,
+        help="Window length in days (default: config.ANALYSIS_WINDOW_SECONDS)",
+    )
+    parser.add_argument("--bot", default=None, help="Print one bot's daily PnL")
+    args = parser.parse_args()
+
+    ledger = PnlLedger(args.ledger_dir)
+    if args.bot:
+        for day, row in ledger.bot_daily(args.bot).items():
+            print(
+                f"  {day}  {row['count']:>6} sandwiches  "
+                f"${row['profit_usd']:>14,.2f}  {row['profit_sol']:.6f} SOL"
+            )
+    else:
+        window_seconds = args.days * 86400
+        print_top_bots(ledger.top_bots(args.top, window_seconds), window_seconds)
@@ -0,0 +1,321 @@
+"""
+Pool Models
+
+Fee-aware swap math for the pool types the scanner monitors:
+
+- ConstantProductPool: x*y=k with the fee retained in reserves (Raydium AMM)
+- ConcentratedLiquidityPool: liquidity in sqrt-price ranges between
+  initialized ticks (Raydium CLMM, Orca Whirlpools)
+- BinLiquidityPool: constant-sum bins at discrete prices (Meteora DLMM)
+
+Every model exposes the same batched interface. A pool state is an array,
+one element per independent scenario, and swap_batch() moves every scenario
+at once. Tick and bin traversal use cumulative amounts at range or bin
+boundaries and np.searchsorted, so a swap crossing any number of ticks or
+bins costs the same as one inside a single range.
+
+token0 is the base token and prices are token1 per token0, so zero_for_one
+swaps sell token0 and push the price down.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple, Type
+
+import numpy as np
+
+import config
+
+
+def _as_array(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _safe_divide(numerator, denominator, fallback) -> np.ndarray:
+    numerator, denominator = np.broadcast_arrays(
+        _as_array(numerator), _as_array(denominator)
+    )
+    out = np.broadcast_to(_as_array(fallback), numerator.shape).copy()
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+class PoolModel(ABC):
+    fee_rate: float = 0.0
+
+    @abstractmethod
+    def initial_state(self, count: Optional[int] = None) -> Any: ...
+
+    @abstractmethod
+    def swap_batch(
+        self, state: Any, amount_in, zero_for_one: bool
+    ) -> Tuple[Any, np.ndarray]: ...
+
+    @abstractmethod
+    def price(self, state: Any) -> np.ndarray: ...
+
+    def quote(self, amount_in, zero_for_one: bool = True) -> np.ndarray:
+        # Output for each amount swapped against the initial state.
+        amount_in = _as_array(amount_in)
+        state = self.initial_state(amount_in.size)
+        _, amount_out = self.swap_batch(state, amount_in.ravel(), zero_for_one)
+        return amount_out.reshape(amount_in.shape)
+
+
+class ConstantProductPool(PoolModel):
+    # State is a (reserve0, reserve1) pair of arrays. Reserves may be arrays
+    # themselves, one pool per element.
+    def __init__(self, reserve0, reserve1, fee_rate: float = 0.0):
+        self.reserve0 = _as_array(reserve0)
+        self.reserve1 = _as_array(reserve1)
+        self.fee_rate = fee_rate
+
+    def initial_state(self, count: Optional[int] = None):
+        if count is None:
+            return self.reserve0, self.reserve1
+        return (
+            np.broadcast_to(self.reserve0, (count,)).copy(),
+            np.broadcast_to(self.reserve1, (count,)).copy(),
+        )
+
+    def swap_batch(self, state, amount_in, zero_for_one: bool):
+        reserve0, reserve1 = state
+        amount_in = _as_array(amount_in)
+        effective_in = amount_in * (1 - self.fee_rate)
+        if zero_for_one:
+            amount_out = reserve1 * effective_in / (reserve0 + effective_in)
+            return (reserve0 + amount_in, reserve1 - amount_out), amount_out
+        amount_out = reserve0 * effective_in / (reserve1 + effective_in)
+        return (reserve0 - amount_out, reserve1 + amount_in), amount_out
+
+    def price(self, state) -> np.ndarray:
+        reserve0, reserve1 = state
+        return reserve1 / reserve0
+
+
+class ConcentratedLiquidityPool(PoolModel):
+    # State is the sqrt price. Range r spans sqrt prices
+    # [sqrt_price_bounds[r], sqrt_price_bounds[r + 1]) with liquidity
+    # liquidities[r]; ranges without liquidity are allowed.
+    def __init__(
+        self,
+        sqrt_price: float,
+        sqrt_price_bounds,
+        liquidities,
+        fee_rate: float = 0.0,
+    ):
+        self.sqrt_price = float(sqrt_price)
+        self.bounds = _as_array(sqrt_price_bounds)
+        self.liquidities = _as_array(liquidities)
+        self.fee_rate = fee_rate
+        if len(self.bounds) != len(self.liquidities) + 1:
+            raise ValueError("Need one more sqrt price bound than liquidity ranges")
+        if np.any(np.diff(self.bounds) <= 0):
+            raise ValueError("sqrt_price_bounds must be strictly increasing")
+
+        # Token amounts held by the curve at each bound: token1 below it and
+        # token0 above it.
+        widths1 = self.liquidities * np.diff(self.bounds)
+        widths0 = self.liquidities * (1 / self.bounds[:-1] - 1 / self.bounds[1:])
+        self._amount1_at = np.concatenate(([0.0], np.cumsum(widths1)))
+        self._amount0_at = np.concatenate((np.cumsum(widths0[::-1])[::-1], [0.0]))
+
+    @classmethod
+    def from_prices(
+        cls, price: float, price_bounds, liquidities, fee_rate: float = 0.0
+    ):
+        sqrt_bounds = np.sqrt(_as_array(price_bounds))
+        return cls(np.sqrt(price), sqrt_bounds, liquidities, fee_rate)
+
+    def initial_state(self, count: Optional[int] = None) -> np.ndarray:
+        return np.full(1 if count is None else count, self.sqrt_price)
+
+    def _range_of(self, sqrt_price: np.ndarray) -> np.ndarray:
+        index = np.searchsorted(self.bounds, sqrt_price, side="right") - 1
+        return np.clip(index, 0, len(self.liquidities) - 1)
+
+    def amount0(self, sqrt_price) -> np.ndarray:
+        sqrt_price = np.clip(_as_array(sqrt_price), self.bounds[0], self.bounds[-1])
+        r = self._range_of(sqrt_price)
+        return self._amount0_at[r + 1] + self.liquidities[r] * (
+            1 / sqrt_price - 1 / self.bounds[r + 1]
+        )
+
+    def amount1(self, sqrt_price) -> np.ndarray:
+        sqrt_price = np.clip(_as_array(sqrt_price), self.bounds[0], self.bounds[-1])
+        r = self._range_of(sqrt_price)
+        return self._amount1_at[r] + self.liquidities[r] * (sqrt_price - self.bounds[r])
+
+    def _sqrt_price_for_amount0(self, amount0: np.ndarray) -> np.ndarray:
+        amount0 = np.clip(amount0, 0.0, self._amount0_at[0])
+        # First bound holding no more token0 than the target; the range just
+        # below it is the one the target lies in and has liquidity.
+        index = np.searchsorted(-self._amount0_at, -amount0, side="left")
+        r = np.clip(index - 1, 0, len(self.liquidities) - 1)
+        inverse = 1 / self.bounds[r + 1] + _safe_divide(
+            amount0 - self._amount0_at[r + 1], self.liquidities[r], 0.0
+        )
+        return 1 / inverse
+
+    def _sqrt_price_for_amount1(self, amount1: np.ndarray) -> np.ndarray:
+        amount1 = np.clip(amount1, 0.0, self._amount1_at[-1])
+        index = np.searchsorted(self._amount1_at, amount1, side="right")
+        r = np.clip(index - 1, 0, len(self.liquidities) - 1)
+        # A target at the top of an empty last range lands on its upper bound.
+        width = self.bounds[r + 1] - self.bounds[r]
+        return self.bounds[r] + _safe_divide(
+            amount1 - self._amount1_at[r], self.liquidities[r], width
+        )
+
+    def swap_batch(self, state, amount_in, zero_for_one: bool):
+        # Input beyond the last initialized tick is not filled.
+        effective_in = _as_array(amount_in) * (1 - self.fee_rate)
+        if zero_for_one:
+            new_state = self._sqrt_price_for_amount0(self.amount0(state) + effective_in)
+            return new_state, self.amount1(state) - self.amount1(new_state)
+        new_state = self._sqrt_price_for_amount1(self.amount1(state) + effective_in)
+        return new_state, self.amount0(state) - self.amount0(new_state)
+
+    def price(self, state) -> np.ndarray:
+        return _as_array(state) ** 2
+
+
+class BinLiquidityPool(PoolModel):
+    # Bin i trades at bin_prices[i] with reserves_x[i] of token0 and
+    # reserves_y[i] of token1. Bins below the active bin hold only token1 and
+    # bins above it only token0. State is the amount of token1 on the curve,
+    # which places the price inside the active bin's constant-sum range.
+    def __init__(
+        self,
+        bin_prices,
+        reserves_x,
+        reserves_y,
+        active_bin: int,
+        fee_rate: float = 0.0,
+    ):
+        self.bin_prices = _as_array(bin_prices)
+        self.reserves_x = _as_array(reserves_x)
+        self.reserves_y = _as_array(reserves_y)
+        self.active_bin = active_bin
+        self.fee_rate = fee_rate
+        if np.any(np.diff(self.bin_prices) <= 0):
+            raise ValueError("bin_prices must be strictly increasing")
+
+        # Each bin's liquidity in token1 units and the cumulative amounts at
+        # bin edges: token1 below an edge and token0 above it.
+        bin_liquidity = self.reserves_y + self.reserves_x * self.bin_prices
+        self._bin_liquidity = bin_liquidity
+        self._amount1_at = np.concatenate(([0.0], np.cumsum(bin_liquidity)))
+        widths0 = bin_liquidity / self.bin_prices
+        self._amount0_at = np.concatenate((np.cumsum(widths0[::-1])[::-1], [0.0]))
+        self._initial_position = (
+            self._amount1_at[active_bin] + self.reserves_y[active_bin]
+        )
+
+    @classmethod
+    def from_bin_step(
+        cls,
+        active_price: float,
+        bin_step_bps: float,
+        reserves_x,
+        reserves_y,
+        active_bin: int,
+        fee_rate: float = 0.0,
+    ):
+        offsets = np.arange(len(reserves_x)) - active_bin
+        prices = active_price * (1 + bin_step_bps / 10_000) ** offsets
+        return cls(prices, reserves_x, reserves_y, active_bin, fee_rate)
+
+    def initial_state(self, count: Optional[int] = None) -> np.ndarray:
+        return np.full(1 if count is None else count, self._initial_position)
+
+    def _bin_of(self, position: np.ndarray) -> np.ndarray:
+        index = np.searchsorted(self._amount1_at, position, side="right") - 1
+        return np.clip(index, 0, len(self.bin_prices) - 1)
+
+    def amount0(self, position) -> np.ndarray:
+        position = np.clip(_as_array(position), 0.0, self._amount1_at[-1])
+        b = self._bin_of(position)
+        above_in_bin = self._amount1_at[b + 1] - position
+        return self._amount0_at[b + 1] + above_in_bin / self.bin_prices[b]
+
+    def amount1(self, position) -> np.ndarray:
+        return np.clip(_as_array(position), 0.0, self._amount1_at[-1])
+
+    def _position_for_amount0(self, amount0: np.ndarray) -> np.ndarray:
+        amount0 = np.clip(amount0, 0.0, self._amount0_at[0])
+        index = np.searchsorted(-self._amount0_at, -amount0, side="left")
+        b = np.clip(index - 1, 0, len(self.bin_prices) - 1)
+        in_bin = amount0 - self._amount0_at[b + 1]
+        return self._amount1_at[b + 1] - in_bin * self.bin_prices[b]
+
+    def swap_batch(self, state, amount_in, zero_for_one: bool):
+        # Input beyond the outermost bin is not filled.
+        effective_in = _as_array(amount_in) * (1 - self.fee_rate)
+        if zero_for_one:
+            new_state = self._position_for_amount0(self.amount0(state) + effective_in)
+            return new_state, self.amount1(state) - self.amount1(new_state)
+        new_state = self.amount1(_as_array(state) + effective_in)
+        return new_state, self.amount0(state) - self.amount0(new_state)
+
+    def price(self, state) -> np.ndarray:
+        return self.bin_prices[self._bin_of(_as_array(state))]
+
+
+def simulate_sandwich(
+    model: PoolModel,
+    bot_amount_in,
+    victim_amount_in,
+    zero_for_one: bool = True,
+) -> Dict[str, np.ndarray]:
+    # Front-run, victim and back-run against the same starting state, for
+    # every (bot, victim) element at once. The victim's counterfactual output
+    # is their swap against the untouched pool.
+    bot_amount_in, victim_amount_in = np.broadcast_arrays(
+        _as_array(bot_amount_in), _as_array(victim_amount_in)
+    )
+    shape = bot_amount_in.shape
+    bot_amount_in = bot_amount_in.ravel()
+    victim_amount_in = victim_amount_in.ravel()
+
+    start = model.initial_state(bot_amount_in.size)
+    after_front, bot_amount_out = model.swap_batch(start, bot_amount_in, zero_for_one)
+    after_victim, victim_amount_out = model.swap_batch(
+        after_front, victim_amount_in, zero_for_one
+    )
+    after_back, bot_amount_returned = model.swap_batch(
+        after_victim, bot_amount_out, not zero_for_one
+    )
+    _, victim_clean_out = model.swap_batch(start, victim_amount_in, zero_for_one)
+
+    results = {
+        "bot_amount_out": bot_amount_out,
+        "victim_amount_out": victim_amount_out,
+        "victim_clean_amount_out": victim_clean_out,
+        "bot_profit": bot_amount_returned - bot_amount_in,
+        "victim_loss": victim_clean_out - victim_amount_out,
+        "initial_price": model.price(start),
+        "final_price": model.price(after_back),
+    }
+    return {name: np.reshape(values, shape) for name, values in results.items()}
+
+
+POOL_MODELS_BY_PROGRAM: Dict[str, Type[PoolModel]] = {
+    config.RAYDIUM_PROGRAM_ID: ConstantProductPool,
+    config.RAYDIUM_CLMM_PROGRAM_ID: ConcentratedLiquidityPool,
+    config.ORCA_PROGRAM_ID: ConcentratedLiquidityPool,
+    config.METEORA_DLMM_PROGRAM_ID: BinLiquidityPool,
+}
+
+# Names as they appear in swap records' swap_program field
+POOL_MODELS_BY_NAME: Dict[str, Type[PoolModel]] = {
+    "Raydium AMM": ConstantProductPool,
+    "Raydium CLMM": ConcentratedLiquidityPool,
+    "Orca Whirlpools": ConcentratedLiquidityPool,
+    "Meteora DLMM": BinLiquidityPool,
+}
+
+
+def model_class_for(program: Optional[str]) -> Optional[Type[PoolModel]]:
+    if not program:
+        return None
+    return POOL_MODELS_BY_PROGRAM.get(program) or POOL_MODELS_BY_NAME.get(program)
@@ -1,11 +1,32 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 
-import requests
+import httpx
+
+import metrics
 
 API_URL = "https://lite-api.jup.ag/price/v3"
 BATCH_SIZE = 50
+REQUEST_TIMEOUT_SECONDS = 10
+MAX_CONCURRENT_PRICE_REQUESTS = 4
+PRICE_REQUEST_RETRIES = 3
+PRICE_RETRY_BACKOFF_SECONDS = 0.5
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+PRICE_CACHE_FILE = Path("results") / "price_cache.json"
+PRICE_BUCKET_SECONDS = 300
+PRICE_TTL_SECONDS = 300
+NEGATIVE_PRICE_TTL_SECONDS = 3600
+MAX_PRICE_LOOKUP_DISTANCE_SECONDS = 3600
+# Historical buckets are kept this long, whatever file is analyzed, so
+# re-analyzing older sandwich files stays free of HTTP calls.
+PRICE_CACHE_RETENTION_SECONDS = 30 * 24 * 60 * 60
 
 
 def _chunk(items: Iterable[str], size: int) -> Iterable[List[str]]:
@@ -19,28 +40,271 @@ def _chunk(items: Iterable[str], size: int) -> Iterable[List[str]]:
         yield batch
 
 
-def fetch_prices_usd(mints: List[str]) -> Dict[str, float]:
+class PriceCache:
+    def __init__(
+        self,
+        path: Optional[Path] = PRICE_CACHE_FILE,
+        bucket_seconds: int = PRICE_BUCKET_SECONDS,
+        ttl_seconds: float = PRICE_TTL_SECONDS,
+        negative_ttl_seconds: float = NEGATIVE_PRICE_TTL_SECONDS,
+    ):
+        self.path = Path(path) if path else None
+        self.bucket_seconds = bucket_seconds
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # mint -> {bucket: (price or None, fetched_at)}; None marks a mint the
+        # API returned no price for.
+        self._entries: Dict[str, Dict[int, Tuple[Optional[float], float]]] = {}
+        self._sorted_buckets: Dict[str, List[int]] = {}
+        self._dirty = False
+        self.load()
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def load(self) -> None:
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Buckets written with a different width cannot be compared.
+        if data.get("bucket_seconds") != self.bucket_seconds:
+            return
+        for mint, buckets in data.get("prices", {}).items():
+            self._entries[mint] = {
+                int(bucket): (price, fetched_at)
+                for bucket, (price, fetched_at) in buckets.items()
+            }
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        payload = {
+            "bucket_seconds": self.bucket_seconds,
+            "prices": {
+                mint: {str(bucket): list(entry) for bucket, entry in buckets.items()}
+                for mint, buckets in self._entries.items()
+            },
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        tmp_path.replace(self.path)
+        self._dirty = False
+
+    def prune(
+        self,
+        now: Optional[float] = None,
+        retention_seconds: float = PRICE_CACHE_RETENTION_SECONDS,
+    ) -> int:
+        # Drops buckets older than retention_seconds by wall-clock time,
+        # keeping each mint's newest bucket for get_current() and
+        # latest_price(). Returns the number of buckets removed.
+        now = time.time() if now is None else now
+        cutoff = self._bucket(now - retention_seconds)
+        removed = 0
+        for mint, buckets in self._entries.items():
+            if not buckets:
+                continue
+            newest = max(buckets)
+            stale = [
+                bucket for bucket in buckets if bucket < cutoff and bucket != newest
+            ]
+            for bucket in stale:
+                del buckets[bucket]
+            if stale:
+                self._sorted_buckets.pop(mint, None)
+                removed += len(stale)
+        if removed:
+            self._dirty = True
+        return removed
+
+    def put(self, mint: str, price: Optional[float], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self._entries.setdefault(mint, {})[self._bucket(now)] = (price, now)
+        self._sorted_buckets.pop(mint, None)
+        self._dirty = True
+
+    def get_current(
+        self, mint: str, now: Optional[float] = None
+    ) -> Tuple[bool, Optional[float]]:
+        # Returns (hit, price); a hit with price None is a cached "no price".
+        now = time.time() if now is None else now
+        buckets = self._entries.get(mint)
+        if not buckets:
+            return False, None
+
+        latest = max(buckets)
+        price, fetched_at = buckets[latest]
+        ttl = self.ttl_seconds if price is not None else self.negative_ttl_seconds
+        if now - fetched_at > ttl:
+            return False, None
+        return True, price
+
+    def latest_price(self, mint: str) -> Optional[float]:
+        buckets = self._entries.get(mint)
+        if not buckets:
+            return None
+        for bucket in sorted(buckets, reverse=True):
+            price = buckets[bucket][0]
+            if price is not None:
+                return price
+        return None
+
+    def price_at(
+        self,
+        mint: str,
+        timestamp: float,
+        max_distance_seconds: float = MAX_PRICE_LOOKUP_DISTANCE_SECONDS,
+    ) -> Optional[float]:
+        buckets = self._entries.get(mint)
+        if not buckets:
+            return None
+
+        sorted_buckets = self._sorted_buckets.get(mint)
+        if sorted_buckets is None:
+            sorted_buckets = sorted(
+                bucket for bucket, (price, _) in buckets.items() if price is not None
+            )
+            self._sorted_buckets[mint] = sorted_buckets
+        if not sorted_buckets:
+            return None
+
+        target = self._bucket(timestamp)
+        pos = bisect_left(sorted_buckets, target)
+        candidates = sorted_buckets[max(pos - 1, 0) : pos + 1]
+        closest = min(candidates, key=lambda bucket: abs(bucket - target))
+        if abs(closest - target) * self.bucket_seconds > max_distance_seconds:
+            return None
+        return buckets[closest][0]
+
+
+def _parse_price_response(data: Dict) -> Dict[str, float]:
+    # A non-object body (a list, null or an error string) goes through the
+    # caller's retry path like any other malformed response.
+    if not isinstance(data, dict):
+        raise ValueError(f"Unexpected price response: {str(data)[:80]}")
+    prices: Dict[str, float] = {}
+    for mint, obj in data.items():
+        if not isinstance(obj, dict):
+            continue
+        price = obj.get("priceUsd") or obj.get("usdPrice") or obj.get("price")
+        if price is None:
+            continue
+        try:
+            prices[mint] = float(price)
+        except (TypeError, ValueError):
+            continue
+    return prices
+
+
+async def _fetch_batch(
+    client: httpx.AsyncClient,
+    batch: List[str],
+    semaphore: asyncio.Semaphore,
+    api_url: str,
+    retries: int,
+    backoff_seconds: float,
+) -> Optional[Dict[str, float]]:
+    for attempt in range(retries + 1):
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                resp = await client.get(api_url, params={"ids": ",".join(batch)})
+                resp.raise_for_status()
+                prices = _parse_price_response(resp.json())
+                metrics.PRICE_REQUESTS.inc(outcome="ok")
+                return prices
+            except httpx.HTTPStatusError as exc:
+                error = exc
+                if exc.response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+            except (httpx.HTTPError, ValueError) as exc:
+                # Transport, redirect and decoding errors alike; only a
+                # non-retryable status code gives up early.
+                error = exc
+            finally:
+                metrics.PRICE_FETCH_SECONDS.observe(time.perf_counter() - started)
+
+        if attempt < retries:
+            metrics.PRICE_REQUESTS.inc(outcome="retried")
+            await asyncio.sleep(backoff_seconds * 2**attempt)
+
+    metrics.PRICE_REQUESTS.inc(outcome="failed")
+    print(f"[WARN] Price fetch failed for {len(batch)} mints: {error}")
+    return None
+
+
+async def fetch_prices_usd_async(
+    mints: List[str],
+    cache: Optional[PriceCache] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    api_url: str = API_URL,
+    max_concurrent_requests: int = MAX_CONCURRENT_PRICE_REQUESTS,
+    retries: int = PRICE_REQUEST_RETRIES,
+    backoff_seconds: float = PRICE_RETRY_BACKOFF_SECONDS,
+) -> Dict[str, float]:
     if not mints:
         return {}
 
     prices: Dict[str, float] = {}
     unique_mints = list(dict.fromkeys(mints))
-    for batch in _chunk(unique_mints, BATCH_SIZE):
+
+    if cache is not None:
+        now = time.time()
+        missing_mints = []
+        for mint in unique_mints:
+            hit, price = cache.get_current(mint, now)
+            if not hit:
+                missing_mints.append(mint)
+            elif price is not None:
+                prices[mint] = price
+        unique_mints = missing_mints
+
+    batches = list(_chunk(unique_mints, BATCH_SIZE))
+    if batches:
+        owns_client = client is None
+        if owns_client:
+            client = httpx.AsyncClient(
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                limits=httpx.Limits(max_connections=max_concurrent_requests),
+            )
+
+        semaphore = asyncio.Semaphore(max_concurrent_requests)
         try:
-            resp = requests.get(API_URL, params={"ids": ",".join(batch)}, timeout=10)
-            resp.raise_for_status()
-        except requests.RequestException as exc:
-            print(f"[WARN] Price fetch failed for {batch}: {exc}")
-            continue
+            batch_results = await asyncio.gather(
+                *(
+                    _fetch_batch(
+                        client, batch, semaphore, api_url, retries, backoff_seconds
+                    )
+                    for batch in batches
+                )
+            )
+        finally:
+            if owns_client:
+                await client.aclose()
 
-        data = resp.json()
-        for mint, obj in data.items():
-            price = obj.get("priceUsd") or obj.get("usdPrice") or obj.get("price")
-            if price is None:
-                continue
-            try:
-                prices[mint] = float(price)
-            except (TypeError, ValueError):
+        now = time.time()
+        for batch, batch_prices in zip(batches, batch_results):
+            if batch_prices is None:
                 continue
+            prices.update(batch_prices)
+            if cache is not None:
+                for mint in batch:
+                    cache.put(mint, batch_prices.get(mint), now)
+
+    if cache is not None:
+        cache.save()
 
     return prices
+
+
+def fetch_prices_usd(
+    mints: List[str], cache: Optional[PriceCache] = None
+) -> Dict[str, float]:
+    # Synchronous entry point; use fetch_prices_usd_async inside an event loop.
+    return asyncio.run(fetch_prices_usd_async(mints, cache=cache))
@@ -1,15 +1,31 @@
+import asyncio
 import json
-from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
-
-from price_fetcher import fetch_prices_usd
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import config
+from pnl_ledger import PnlLedger, print_top_bots
+from price_fetcher import PriceCache, fetch_prices_usd_async
+from sandwich_detect import load_db_sandwiches
+from swap_db import SwapDatabase, is_db_path
+from swap_store import (
+    MISSING_ID,
+    PubkeyInterner,
+    SwapStore,
+    is_npz_path,
+    load_sandwiches_npz,
+    save_profit_columns_npz,
+)
 
 SOL_MINT = "So11111111111111111111111111111111111111112"
 RESULTS_DIR = Path("results")
 RESULTS_DIR.mkdir(exist_ok=True)
 DEFAULT_ANALYSIS_PATH = RESULTS_DIR / "profit_analysis.json"
 DEFAULT_BOT_PNL_PATH = RESULTS_DIR / "pnl_report_per_bot.json"
+TOP_BOT_COUNT = 5
+LEG_KEYS = ("front_run", "victim", "back_run")
 
 
 def load_sandwiches(path: Path) -> List[Dict[str, Any]]:
@@ -31,90 +47,429 @@ def get_bot(s: Dict[str, Any]) -> str:
     )
 
 
+def _flow_columns(
+    front_in: np.ndarray,
+    front_out: np.ndarray,
+    back_in: np.ndarray,
+    back_out: np.ndarray,
+    front_amount_in: np.ndarray,
+    front_amount_out: np.ndarray,
+    back_amount_in: np.ndarray,
+    back_amount_out: np.ndarray,
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    # The profit flows from the front run's input back to the back run's
+    # output, or from the front run's output to the back run's input; legs
+    # matching neither don't align. Returns the aligned mask with the flows.
+    forward = front_in == back_out
+    aligned = forward | (front_out == back_in)
+    return aligned, {
+        "token_spent_id": np.where(forward, front_in, front_out),
+        "token_received_id": np.where(forward, back_out, back_in),
+        "amount_spent": np.where(forward, front_amount_in, front_amount_out),
+        "amount_received": np.where(forward, back_amount_out, back_amount_in),
+    }
+
+
+def _intern_values(values: List[Optional[str]], interner: PubkeyInterner) -> np.ndarray:
+    # One intern call per distinct value rather than per row, in first-seen
+    # order so IDs (and tie order downstream) don't depend on the hash seed.
+    ids = {value: interner.intern(value) for value in dict.fromkeys(values)}
+    return np.fromiter(map(ids.__getitem__, values), dtype=np.int32, count=len(values))
+
+
+def _float_or_nan(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _amount_columns(values: np.ndarray) -> np.ndarray:
+    # Whole-array conversion when every amount parses; otherwise per value,
+    # with unparseable ones as NaN.
+    try:
+        return values.astype(np.float64)
+    except (TypeError, ValueError):
+        return np.vectorize(_float_or_nan, otypes=[np.float64])(values)
+
+
+def sandwich_profit_columns(
+    sandwiches: List[Dict[str, Any]], interner: PubkeyInterner
+) -> Tuple[Dict[str, np.ndarray], List[str]]:
+    # Interns the legs of dict sandwiches into flat columns. Legs are
+    # referenced as rows 3k, 3k + 1 and 3k + 2 of the returned signatures.
+    # Sandwiches missing a flow field, with a non-numeric or non-finite
+    # amount, or with misaligned legs are dropped.
+    sandwich_ids = []
+    bots = []
+    flows = []
+    block_times = []
+    signatures = []
+    for sid, s in enumerate(sandwiches, start=1):
+        fr = s.get("front_run") or {}
+        br = s.get("back_run") or {}
+        try:
+            flows.append(
+                (
+                    fr["token_in"],
+                    fr["token_out"],
+                    br["token_in"],
+                    br["token_out"],
+                    fr["amount_in"],
+                    fr["amount_out"],
+                    br["amount_in"],
+                    br["amount_out"],
+                )
+            )
+        except (KeyError, TypeError):
+            continue
+        sandwich_ids.append(sid)
+        bots.append(get_bot(s))
+        block_times.append(br.get("block_time") or MISSING_ID)
+        victim = s.get("victim") or {}
+        for tx in (fr, victim, br):
+            signatures.append(tx.get("signature", ""))
+
+    flows = np.array(flows, dtype=object).reshape(-1, 8)
+    mint_ids = _intern_values(flows[:, :4].ravel().tolist(), interner).reshape(-1, 4)
+    amounts = _amount_columns(flows[:, 4:])
+    aligned, columns = _flow_columns(*mint_ids.T, *amounts.T)
+    aligned &= np.isfinite(amounts).all(axis=1)
+
+    front = np.arange(0, 3 * len(sandwich_ids), 3, dtype=np.int64)
+    columns.update(
+        sandwich_id=np.array(sandwich_ids, dtype=np.int64),
+        bot_id=_intern_values(bots, interner),
+        front_run=front,
+        victim=front + 1,
+        back_run=front + 2,
+        block_time=np.array(block_times, dtype=np.int64),
+    )
+    return {name: values[aligned] for name, values in columns.items()}, signatures
+
+
 def determine_flow(s: Dict[str, Any]) -> Tuple[str, str, float, float]:
-    fr = s["front_run"]
-    br = s["back_run"]
-    if fr["token_in"] == br["token_out"]:
-        return (
-            fr["token_in"],
-            br["token_out"],
-            float(fr["amount_in"]),
-            float(br["amount_out"]),
+    # (token_spent, token_received, amount_spent, amount_received) of one
+    # sandwich, using the same rules as the columnar path.
+    interner = PubkeyInterner()
+    columns, _ = sandwich_profit_columns([s], interner)
+    if not len(columns["sandwich_id"]):
+        raise ValueError("Front/back run directions do not align")
+    return (
+        interner.lookup(int(columns["token_spent_id"][0])),
+        interner.lookup(int(columns["token_received_id"][0])),
+        float(columns["amount_spent"][0]),
+        float(columns["amount_received"][0]),
+    )
+
+
+def store_profit_columns(
+    store: SwapStore, legs: List[Tuple[int, int, int]]
+) -> Dict[str, np.ndarray]:
+    # Legs are referenced by their store rows. Sandwiches whose front and
+    # back runs do not align are dropped.
+    leg_array = np.array(legs, dtype=np.int64).reshape(-1, 3)
+    front, victim, back = leg_array[:, 0], leg_array[:, 1], leg_array[:, 2]
+    mint_in = np.frombuffer(store.mint_in_ids, dtype=np.int32)
+    mint_out = np.frombuffer(store.mint_out_ids, dtype=np.int32)
+    amounts_in = np.frombuffer(store.amounts_in, dtype=np.float64)
+    amounts_out = np.frombuffer(store.amounts_out, dtype=np.float64)
+
+    aligned, columns = _flow_columns(
+        mint_in[front],
+        mint_out[front],
+        mint_in[back],
+        mint_out[back],
+        amounts_in[front],
+        amounts_out[front],
+        amounts_in[back],
+        amounts_out[back],
+    )
+    columns.update(
+        sandwich_id=np.arange(1, len(leg_array) + 1, dtype=np.int64),
+        bot_id=np.frombuffer(store.signer_ids, dtype=np.int32)[front],
+        front_run=front,
+        victim=victim,
+        back_run=back,
+        block_time=np.frombuffer(store.block_times, dtype=np.int64)[back],
+    )
+    return {name: values[aligned] for name, values in columns.items()}
+
+
+def historical_price_array(
+    price_cache: Optional[PriceCache],
+    interner: PubkeyInterner,
+    mint_ids: np.ndarray,
+    block_times: np.ndarray,
+) -> np.ndarray:
+    # Cached price near each block time, NaN where there is none. One lookup
+    # per distinct (mint, block time) pair covers every sandwich sharing it,
+    # and is looked up at the block time itself, not its bucket.
+    prices = np.full(len(block_times), np.nan)
+    if price_cache is None or not len(block_times):
+        return prices
+
+    timed = np.flatnonzero(block_times > 0)
+    pairs, inverse = np.unique(
+        np.stack([mint_ids[timed].astype(np.int64), block_times[timed]], axis=1),
+        axis=0,
+        return_inverse=True,
+    )
+    pair_prices = np.array(
+        [
+            price_cache.price_at(interner.lookup(mint_id), block_time)
+            for mint_id, block_time in pairs.tolist()
+        ],
+        dtype=np.float64,
+    )
+    prices[timed] = pair_prices[inverse.reshape(-1)]
+    return prices
+
+
+def _sol_ids(interner: PubkeyInterner, count: int) -> np.ndarray:
+    return np.full(count, interner.intern(SOL_MINT), dtype=np.int32)
+
+
+def mints_needing_prices(
+    columns: Dict[str, np.ndarray],
+    interner: PubkeyInterner,
+    price_cache: Optional[PriceCache],
+) -> List[str]:
+    # Only the received token and SOL are priced; skip the ones the cache
+    # already has a price for near the back-run's block time.
+    token_received = columns["token_received_id"]
+    block_times = columns["block_time"]
+    if price_cache is not None:
+        missing = np.isnan(
+            historical_price_array(price_cache, interner, token_received, block_times)
         )
-    if fr["token_out"] == br["token_in"]:
-        return (
-            fr["token_out"],
-            br["token_in"],
-            float(fr["amount_out"]),
-            float(br["amount_in"]),
+        token_received = token_received[missing]
+        sol_missing = np.isnan(
+            historical_price_array(
+                price_cache, interner, _sol_ids(interner, len(block_times)), block_times
+            )
         )
-    raise ValueError("Front/back run directions do not align")
+    else:
+        sol_missing = np.ones(1, dtype=bool)
+
+    mints = [interner.lookup(i) for i in np.unique(token_received).tolist()]
+    if sol_missing.any() and SOL_MINT not in mints:
+        mints.append(SOL_MINT)
+    return mints
+
+
+def compute_profit_columns(
+    columns: Dict[str, np.ndarray],
+    interner: PubkeyInterner,
+    prices_usd: Dict[str, float],
+    sol_price: float,
+    price_cache: Optional[PriceCache] = None,
+) -> Dict[str, np.ndarray]:
+    price_by_id = np.zeros(len(interner) + 1, dtype=np.float64)
+    for mint, price in prices_usd.items():
+        mint_id = interner.get_id(mint)
+        if mint_id != MISSING_ID:
+            price_by_id[mint_id] = price
+
+    token_received = columns["token_received_id"]
+    block_times = columns["block_time"]
+
+    # Prefer prices recorded around the back-run's block time over "now".
+    price_usd = historical_price_array(
+        price_cache, interner, token_received, block_times
+    )
+    price_usd = np.where(np.isnan(price_usd), price_by_id[token_received], price_usd)
+    sol_prices = historical_price_array(
+        price_cache, interner, _sol_ids(interner, len(block_times)), block_times
+    )
+    sol_prices = np.where(np.isnan(sol_prices), sol_price, sol_prices)
+
+    profit_raw = columns["amount_received"] - columns["amount_spent"]
+    profit_usd = profit_raw * price_usd
+    profit_sol = np.divide(
+        profit_usd,
+        sol_prices,
+        out=np.zeros_like(profit_usd),
+        where=sol_prices != 0,
+    )
+
+    columns = dict(columns)
+    columns.update(
+        price_usd=price_usd,
+        profit_raw=profit_raw,
+        profit_usd=profit_usd,
+        profit_sol=profit_sol,
+    )
+    return columns
 
 
 def compute_profit(
-    s: Dict[str, Any], prices_usd: Dict[str, float], sol_price: float, sid: int
+    s: Dict[str, Any],
+    prices_usd: Dict[str, float],
+    sol_price: float,
+    sid: int,
+    price_cache: Optional[PriceCache] = None,
 ) -> Dict[str, Any]:
-    token_spent, token_received, amount_spent, amount_received = determine_flow(s)
-    profit_raw = amount_received - amount_spent
-    price_usd = prices_usd.get(token_received, 0.0)
-    profit_usd = profit_raw * price_usd
-    profit_sol = profit_usd / sol_price if sol_price else 0.0
+    # Single-sandwich wrapper over compute_profit_columns; batches should
+    # call the columnar functions directly.
+    interner = PubkeyInterner()
+    columns, signatures = sandwich_profit_columns([s], interner)
+    if not len(columns["sandwich_id"]):
+        raise ValueError("Front/back run directions do not align")
+    columns = compute_profit_columns(
+        columns, interner, prices_usd, sol_price, price_cache
+    )
+    row = profit_rows(columns, interner, signatures, [s])[0]
+    row["sandwich_id"] = sid
+    return row
 
-    return {
-        "sandwich_id": sid,
-        "bot": get_bot(s),
-        "token_spent": token_spent,
-        "amount_spent": amount_spent,
-        "token_received": token_received,
-        "amount_received": amount_received,
-        "profit_token": token_received,
-        "profit_raw": profit_raw,
-        "profit_usd": profit_usd,
-        "profit_sol": profit_sol,
-        "front_run": s.get("front_run"),
-        "victim": s.get("victim"),
-        "back_run": s.get("back_run"),
-    }
 
+def sort_profit_columns(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    order = np.argsort(-columns["profit_usd"], kind="stable")
+    return {name: values[order] for name, values in columns.items()}
 
-def summarize_results(
-    results: List[Dict[str, Any]], sol_price: float
+
+def summarize_profit_columns(
+    columns: Dict[str, np.ndarray],
+    interner: PubkeyInterner,
+    sol_price: float,
+    top_n: int = TOP_BOT_COUNT,
 ) -> Dict[str, Any]:
+    profit_raw = columns["profit_raw"]
+    profit_usd = columns["profit_usd"]
+    profit_sol = columns["profit_sol"]
+    count = len(profit_raw)
+    profitable_count = int(np.count_nonzero(profit_raw > 0))
+
     summary: Dict[str, Any] = {
-        "total_sandwiches": len(results),
-        "profitable_count": len([r for r in results if r["profit_raw"] > 0]),
-        "loss_count": len([r for r in results if r["profit_raw"] <= 0]),
-        "max_profit_usd": max((r["profit_usd"] for r in results), default=0.0),
-        "max_profit_sol": max((r["profit_sol"] for r in results), default=0.0),
-        "total_profit_usd": sum(r["profit_usd"] for r in results),
-        "total_profit_sol": sum(r["profit_sol"] for r in results),
+        "total_sandwiches": count,
+        "profitable_count": profitable_count,
+        "loss_count": count - profitable_count,
+        "max_profit_usd": float(profit_usd.max()) if count else 0.0,
+        "max_profit_sol": float(profit_sol.max()) if count else 0.0,
+        "total_profit_usd": float(profit_usd.sum()),
+        "total_profit_sol": float(profit_sol.sum()),
         "sol_price_usd": sol_price,
     }
 
-    per_bot = defaultdict(lambda: {"count": 0, "profit_usd": 0.0, "profit_sol": 0.0})
-    for r in results:
-        row = per_bot[r["bot"]]
-        row["count"] += 1
-        row["profit_usd"] += r["profit_usd"]
-        row["profit_sol"] += r["profit_sol"]
-
-    summary["top_bots"] = sorted(
-        (
-            {
-                "bot": bot,
-                "sandwich_count": data["count"],
-                "profit_usd": data["profit_usd"],
-                "profit_sol": data["profit_sol"],
-            }
-            for bot, data in per_bot.items()
-        ),
-        key=lambda row: row["profit_usd"],
-        reverse=True,
-    )[:5]
+    # One grouped reduction over bots instead of a dict update per row.
+    bots, inverse = np.unique(columns["bot_id"], return_inverse=True)
+    inverse = inverse.reshape(-1)
+    bot_counts = np.bincount(inverse, minlength=len(bots))
+    bot_usd = np.bincount(inverse, weights=profit_usd, minlength=len(bots))
+    bot_sol = np.bincount(inverse, weights=profit_sol, minlength=len(bots))
+
+    top = np.argsort(-bot_usd, kind="stable")[:top_n]
+    summary["top_bots"] = [
+        {
+            "bot": interner.lookup(int(bots[i])) or "unknown",
+            "sandwich_count": int(bot_counts[i]),
+            "profit_usd": float(bot_usd[i]),
+            "profit_sol": float(bot_sol[i]),
+        }
+        for i in top.tolist()
+    ]
 
     return summary
 
 
+def summarize_results(
+    results: List[Dict[str, Any]], sol_price: float
+) -> Dict[str, Any]:
+    # Summarizes compute_profit() rows through summarize_profit_columns.
+    interner = PubkeyInterner()
+    columns = {
+        name: np.array([r[name] for r in results], dtype=np.float64)
+        for name in ("profit_raw", "profit_usd", "profit_sol")
+    }
+    columns["bot_id"] = _intern_values([r["bot"] for r in results], interner)
+    return summarize_profit_columns(columns, interner, sol_price)
+
+
+def profit_rows(
+    columns: Dict[str, np.ndarray],
+    interner: PubkeyInterner,
+    signatures: List[str],
+    sandwiches: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    # JSON rows embed the input legs when they came from dicts and reference
+    # them by signature when they came from a store.
+    lookup = interner.lookup
+    block_times = columns["block_time"].tolist()
+    rows = []
+    for i, sid in enumerate(columns["sandwich_id"].tolist()):
+        token_received = lookup(int(columns["token_received_id"][i]))
+        row = {
+            "sandwich_id": sid,
+            "bot": lookup(int(columns["bot_id"][i])),
+            "token_spent": lookup(int(columns["token_spent_id"][i])),
+            "amount_spent": float(columns["amount_spent"][i]),
+            "token_received": token_received,
+            "amount_received": float(columns["amount_received"][i]),
+            "profit_token": token_received,
+            "profit_raw": float(columns["profit_raw"][i]),
+            "profit_usd": float(columns["profit_usd"][i]),
+            "profit_sol": float(columns["profit_sol"][i]),
+            "price_usd": float(columns["price_usd"][i]),
+            "priced_at": None if block_times[i] == MISSING_ID else block_times[i],
+        }
+        if sandwiches is not None:
+            s = sandwiches[sid - 1]
+            for key in LEG_KEYS:
+                row[key] = s.get(key)
+        else:
+            for key in LEG_KEYS:
+                row[f"{key}_signature"] = signatures[int(columns[key][i])]
+        rows.append(row)
+    return rows
+
+
+def profit_output_columns(
+    columns: Dict[str, np.ndarray], interner: PubkeyInterner, signatures: List[str]
+) -> Dict[str, np.ndarray]:
+    # A trailing empty key makes MISSING_ID (-1) index to "".
+    keys = np.array(interner.keys + [""], dtype=str)
+    signatures = np.array(signatures, dtype=str)
+    return {
+        "sandwich_id": columns["sandwich_id"],
+        "bot": keys[columns["bot_id"]],
+        "token_spent": keys[columns["token_spent_id"]],
+        "amount_spent": columns["amount_spent"],
+        "token_received": keys[columns["token_received_id"]],
+        "amount_received": columns["amount_received"],
+        "profit_token": keys[columns["token_received_id"]],
+        "profit_raw": columns["profit_raw"],
+        "profit_usd": columns["profit_usd"],
+        "profit_sol": columns["profit_sol"],
+        "price_usd": columns["price_usd"],
+        "priced_at": columns["block_time"],
+        "front_run_signature": signatures[columns["front_run"]],
+        "victim_signature": signatures[columns["victim"]],
+        "back_run_signature": signatures[columns["back_run"]],
+    }
+
+
+def ledger_entries(
+    columns: Dict[str, np.ndarray], interner: PubkeyInterner, signatures: List[str]
+) -> List[Dict[str, Any]]:
+    lookup = interner.lookup
+    lists = {name: values.tolist() for name, values in columns.items()}
+    return [
+        {
+            "front_run_signature": signatures[lists["front_run"][i]],
+            "victim_signature": signatures[lists["victim"][i]],
+            "back_run_signature": signatures[lists["back_run"][i]],
+            "bot": lookup(lists["bot_id"][i]) or "unknown",
+            "block_time": lists["block_time"][i],
+            "profit_token": lookup(lists["token_received_id"][i]),
+            "profit_raw": lists["profit_raw"][i],
+            "profit_usd": lists["profit_usd"][i],
+            "profit_sol": lists["profit_sol"][i],
+        }
+        for i in range(len(lists["sandwich_id"]))
+    ]
+
+
 def print_summary(summary: Dict[str, Any]) -> None:
     print("\n" + "=" * 70)
     print("PROFIT ANALYSIS SUMMARY")
@@ -158,34 +513,60 @@ def save_results(path: Path, payload: Any) -> None:
     print(f"  Saved: {path.name}")
 
 
-def run_profit_analysis(
+async def run_profit_analysis_async(
     sandwich_file: Path,
     output_analysis: Path = DEFAULT_ANALYSIS_PATH,
     output_bot: Path = DEFAULT_BOT_PNL_PATH,
+    prices_usd: Optional[Dict[str, float]] = None,
+    price_cache: Optional[PriceCache] = None,
+    ledger: Optional[PnlLedger] = None,
+    slot_range: Optional[Tuple[int, int]] = None,
 ):
+    # slot_range limits a database input to sandwiches in those slots
+    # (inclusive); file inputs are always read whole.
     print("\n" + "=" * 70)
     print("PROFIT ANALYSIS")
     print("=" * 70)
     print(f"\n Loading sandwiches from: {sandwich_file}")
 
-    sandwiches = load_sandwiches(sandwich_file)
-    if not sandwiches:
+    if is_npz_path(sandwich_file):
+        store, legs = load_sandwiches_npz(sandwich_file)
+        sandwiches = None
+        sandwich_count = len(legs)
+        interner = store.interner
+        signatures = store.signatures
+        columns = store_profit_columns(store, legs)
+    else:
+        if is_db_path(sandwich_file):
+            with SwapDatabase(sandwich_file) as db:
+                sandwiches = load_db_sandwiches(db, *(slot_range or ()))
+        else:
+            sandwiches = load_sandwiches(sandwich_file)
+        sandwich_count = len(sandwiches)
+        interner = PubkeyInterner()
+        columns, signatures = sandwich_profit_columns(sandwiches, interner)
+
+    if not sandwich_count:
         print(" No sandwiches found.")
         return
 
-    print(f" Loaded {len(sandwiches)} sandwiches")
+    print(f" Loaded {sandwich_count} sandwiches")
 
-    print("\n Fetching token prices from Jupiter...")
-    mints = set()
-    for s in sandwiches:
-        for tx_key in ("front_run", "back_run", "victim"):
-            tx = s.get(tx_key)
-            if tx:
-                mints.add(tx["token_in"])
-                mints.add(tx["token_out"])
+    if prices_usd is None:
+        if price_cache is None:
+            price_cache = PriceCache()
+        # Drop buckets past the retention period before the cache is saved
+        # so it doesn't grow forever in follow mode.
+        price_cache.prune()
 
-    prices_usd = fetch_prices_usd(list(mints))
+        print("\n Fetching token prices from Jupiter...")
+        mints = mints_needing_prices(columns, interner, price_cache)
+        prices_usd = await fetch_prices_usd_async(mints, cache=price_cache)
+    else:
+        print("\n Using supplied token prices")
     sol_price = prices_usd.get(SOL_MINT, 0.0)
+    if not sol_price and price_cache is not None:
+        sol_price = price_cache.latest_price(SOL_MINT) or 0.0
     if not sol_price:
         print("  [WARN] SOL price missing; SOL profits will be zero.")
     else:
@@ -193,39 +574,80 @@ def run_profit_analysis(
         print(f"   SOL price: ${sol_price:.2f} USD")
 
     print("\n Computing profits for each sandwich...")
-    results: List[Dict[str, Any]] = []
-    skipped = 0
-
-    for idx, s in enumerate(sandwiches, start=1):
-        try:
-            results.append(compute_profit(s, prices_usd, sol_price, idx))
-        except Exception as exc:
-            skipped += 1
-            if skipped <= 3:  # Only show first 3 warnings
-                print(f"  Skipped sandwich #{idx}: {exc}")
+    skipped = sandwich_count - len(columns["sandwich_id"])
+    if skipped:
+        print(f"  Skipped {skipped} sandwiches with missing or misaligned legs")
 
-    if skipped > 3:
-        print(f"  ... and {skipped - 3} more skipped")
-
-    results.sort(key=lambda r: r["profit_usd"], reverse=True)
-    print(f" Processed {len(results)} sandwiches successfully")
+    columns = compute_profit_columns(
+        columns, interner, prices_usd, sol_price, price_cache
+    )
+    columns = sort_profit_columns(columns)
+    print(f" Processed {len(columns['sandwich_id'])} sandwiches successfully")
 
-    summary = summarize_results(results, sol_price)
+    summary = summarize_profit_columns(columns, interner, sol_price)
     print_summary(summary)
 
     print("\n Saving results...")
-    save_results(output_analysis, results)
+    if is_npz_path(output_analysis):
+        save_profit_columns_npz(
+            output_analysis, profit_output_columns(columns, interner, signatures)
+        )
+        print(f"  Saved: {Path(output_analysis).name}")
+    elif is_db_path(output_analysis):
+        with SwapDatabase(output_analysis) as db:
+            db.insert_profits(profit_rows(columns, interner, signatures))
+        print(f"  Saved: {Path(output_analysis).name}")
+    else:
+        save_results(
+            output_analysis, profit_rows(columns, interner, signatures, sandwiches)
+        )
     bot_summary = {row["bot"]: row for row in summary["top_bots"]}
     save_results(output_bot, bot_summary)
+
+    if ledger is not None:
+        stats = ledger.merge(ledger_entries(columns, interner, signatures))
+        print(
+            f"  Ledger: {stats['added']} new sandwiches, "
+            f"{stats['duplicates']} already recorded, "
+            f"{stats['undated']} skipped without a block time"
+        )
+        print_top_bots(
+            ledger.top_bots(TOP_BOT_COUNT, config.ANALYSIS_WINDOW_SECONDS),
+            config.ANALYSIS_WINDOW_SECONDS,
+        )
     print(" Analysis complete!\n")
 
 
+def run_profit_analysis(
+    sandwich_file: Path,
+    output_analysis: Path = DEFAULT_ANALYSIS_PATH,
+    output_bot: Path = DEFAULT_BOT_PNL_PATH,
+    prices_usd: Optional[Dict[str, float]] = None,
+    price_cache: Optional[PriceCache] = None,
+    ledger: Optional[PnlLedger] = None,
+    slot_range: Optional[Tuple[int, int]] = None,
+):
+    return asyncio.run(
+        run_profit_analysis_async(
+            sandwich_file,
+            output_analysis,
+            output_bot,
+            prices_usd,
+            price_cache,
+            ledger,
+            slot_range,
+        )
+    )
+
+
 def main():
     sandwich_file = (RESULTS_DIR / "sandwich_attacks.json").expanduser()
     analysis_output = DEFAULT_ANALYSIS_PATH.expanduser()
     pnl_output = DEFAULT_BOT_PNL_PATH.expanduser()
     try:
-        run_profit_analysis(sandwich_file, analysis_output, pnl_output)
+        run_profit_analysis(
+            sandwich_file, analysis_output, pnl_output, ledger=PnlLedger()
+        )
     except Exception as exc:
         print(f"[ERROR] Universal PnL run failed: {exc}")
 
@@ -0,0 +1,195 @@
+"""
+Offline Pipeline Replay
+
+Feeds recorded getBlock responses through swap extraction, sandwich detection
+and profit analysis without an RPC connection. Recordings are raw JSON-RPC
+responses named <slot>.json or <slot>.json.gz, which is the layout written by
+the block cache.
+"""
+
+import gzip
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import block_cache
+import profit_analysis
+import sandwich_detect
+import utils
+from main import get_monitored_pools, save_transactions_to_file
+
+RESULTS_DIR = Path("results")
+DEFAULT_RECORDINGS_DIR = block_cache.DEFAULT_CACHE_DIR
+DEFAULT_REPLAY_OUTPUT_DIR = RESULTS_DIR / "replay"
+RECORDING_SUFFIXES = (".json.gz", ".json")
+
+
+def _recording_slot(path: Path) -> Optional[int]:
+    for suffix in RECORDING_SUFFIXES:
+        if path.name.endswith(suffix):
+            try:
+                return int(path.name[: -len(suffix)])
+            except ValueError:
+                return None
+    return None
+
+
+def list_recordings(
+    recordings_dir=DEFAULT_RECORDINGS_DIR,
+    start_slot: Optional[int] = None,
+    end_slot: Optional[int] = None,
+) -> List[Tuple[int, Path]]:
+    recordings = {}
+    for path in Path(recordings_dir).iterdir():
+        slot = _recording_slot(path)
+        if slot is None:
+            continue
+        if start_slot is not None and slot < start_slot:
+            continue
+        if end_slot is not None and slot > end_slot:
+            continue
+        recordings[slot] = path
+    return sorted(recordings.items())
+
+
+def read_recording(path: Path) -> str:
+    if path.name.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+    return path.read_text(encoding="utf-8")
+
+
+def iter_recorded_blocks(
+    recordings_dir=DEFAULT_RECORDINGS_DIR,
+    start_slot: Optional[int] = None,
+    end_slot: Optional[int] = None,
+) -> Iterator[Tuple[int, str]]:
+    for slot, path in list_recordings(recordings_dir, start_slot, end_slot):
+        yield slot, read_recording(path)
+
+
+def replay_blocks(
+    recorded_blocks: Iterator[Tuple[int, str]],
+    pool_configurations: List[Dict[str, str]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+    program_to_pool_mapping = {
+        pool["address"]: pool["name"] for pool in pool_configurations
+    }
+    detector = sandwich_detect.StreamingSandwichDetector()
+
+    transactions: List[Dict[str, Any]] = []
+    sandwiches: List[Dict[str, Any]] = []
+    stats = {
+        "blocks_replayed": 0,
+        "failed_slots": [],
+        "read_seconds": 0.0,
+        "parse_seconds": 0.0,
+        "detect_seconds": 0.0,
+    }
+
+    while True:
+        started = time.perf_counter()
+        try:
+            slot, raw_block = next(recorded_blocks)
+        except StopIteration:
+            break
+        stats["read_seconds"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            block_data = utils.parse_block_response(raw_block)
+            swaps = utils.extract_swaps_from_block(
+                block_data, slot, program_to_pool_mapping
+            )
+        except Exception:
+            stats["failed_slots"].append(slot)
+            continue
+        stats["parse_seconds"] += time.perf_counter() - started
+        stats["blocks_replayed"] += 1
+
+        started = time.perf_counter()
+        sandwiches.extend(detector.process_slot(slot, swaps))
+        stats["detect_seconds"] += time.perf_counter() - started
+
+        transactions.extend(swaps)
+
+    return transactions, sandwiches, stats
+
+
+def load_prices(prices_file) -> Dict[str, float]:
+    with Path(prices_file).open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {mint: float(price) for mint, price in data.items()}
+
+
+def run_replay(
+    recordings_dir=DEFAULT_RECORDINGS_DIR,
+    start_slot: Optional[int] = None,
+    end_slot: Optional[int] = None,
+    output_dir=DEFAULT_REPLAY_OUTPUT_DIR,
+    prices_file=None,
+) -> None:
+    print("=" * 70)
+    print("OFFLINE PIPELINE REPLAY")
+    print("=" * 70)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"\nReplaying recorded blocks from: {Path(recordings_dir).absolute()}")
+    transactions, sandwiches, stats = replay_blocks(
+        iter_recorded_blocks(recordings_dir, start_slot, end_slot),
+        get_monitored_pools(),
+    )
+
+    print(f"Replayed {stats['blocks_replayed']} blocks")
+    if stats["failed_slots"]:
+        print(f"Failed to parse {len(stats['failed_slots'])} blocks")
+    print(f"Found {len(transactions)} swap transactions")
+    print(f"Detected {len(sandwiches)} sandwiches")
+    print(f"  Read:   {stats['read_seconds']:.3f}s")
+    print(f"  Parse:  {stats['parse_seconds']:.3f}s")
+    print(f"  Detect: {stats['detect_seconds']:.3f}s")
+
+    save_transactions_to_file(transactions, output_dir / "transactions.json")
+    sandwich_file = output_dir / "sandwich_attacks.json"
+    sandwich_detect.save_sandwich_results(sandwiches, sandwich_file)
+
+    if prices_file:
+        profit_analysis.run_profit_analysis(
+            sandwich_file,
+            output_dir / "profit_analysis.json",
+            output_dir / "pnl_report_per_bot.json",
+            prices_usd=load_prices(prices_file),
+        )
+    else:
+        print("\nNo prices file given; skipping profit analysis")
+
+    print("\n" + "=" * 70)
+    print("Replay complete")
+    print("=" * 70 + "\n")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Replay recorded blocks offline")
+    parser.add_argument("--recordings-dir", default=DEFAULT_RECORDINGS_DIR)
+    parser.add_argument("--start-slot", type=int, default=None)
+    parser.add_argument("--end-slot", type=int, default=None)
+    parser.add_argument("--output-dir", default=DEFAULT_REPLAY_OUTPUT_DIR)
+    parser.add_argument(
+        "--prices-file",
+        default=None,
+        help="JSON file mapping mint -> USD price, used instead of the Jupiter API",
+    )
+    args = parser.parse_args()
+
+    run_replay(
+        args.recordings_dir,
+        args.start_slot,
+        args.end_slot,
+        args.output_dir,
+        args.prices_file,
+    )
@@ -0,0 +1,299 @@
+"""
+RPC Endpoint Pool
+
+Spreads RPC calls across several endpoints. Each endpoint keeps an EWMA of
+its latency and error rate; requests go to endpoints at random, weighted by
+expected latency after errors and in-flight load. An endpoint that fails
+CIRCUIT_BREAKER_FAILURES times in a row is taken out of rotation for
+CIRCUIT_BREAKER_COOLDOWN_SECONDS, then goes half-open: a single probe
+request is admitted, and its outcome closes or reopens the breaker. A request
+still running past its endpoint's HEDGE_PERCENTILE latency is hedged to a
+second endpoint and the first answer wins.
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from solana.rpc.async_api import AsyncClient
+
+import metrics
+
+EWMA_ALPHA = 0.2
+LATENCY_WINDOW = 200
+HEDGE_PERCENTILE = 0.95
+MIN_HEDGE_SAMPLES = 20
+DEFAULT_HEDGE_DELAY_SECONDS = 1.0
+CIRCUIT_BREAKER_FAILURES = 5
+CIRCUIT_BREAKER_COOLDOWN_SECONDS = 30.0
+MIN_SUCCESS_RATE = 0.05
+RAW_REQUEST_TIMEOUT_SECONDS = 30.0
+
+Request = Callable[["RpcClient"], Awaitable[Any]]
+
+
+def endpoint_label(url: str) -> str:
+    # Host and path only, so API keys in the query string stay out of logs
+    # and metrics.
+    parts = urlsplit(url)
+    return (parts.netloc + parts.path.rstrip("/")) or url
+
+
+class RpcClient(AsyncClient):
+    # AsyncClient plus an httpx client of our own on the same endpoint, for
+    # getBlock calls whose responses are parsed and cached as raw text and
+    # for JSON-RPC batches, neither of which solana-py's public API offers.
+    def __init__(self, url: str, timeout: float = RAW_REQUEST_TIMEOUT_SECONDS):
+        super().__init__(url)
+        self.url = url
+        self.raw_session = httpx.AsyncClient(
+            timeout=timeout, headers={"Content-Type": "application/json"}
+        )
+
+    async def post_raw(self, body: str) -> str:
+        response = await self.raw_session.post(self.url, content=body)
+        response.raise_for_status()
+        return response.text
+
+    async def close(self) -> None:
+        await super().close()
+        await self.raw_session.aclose()
+
+
+class EndpointHealth:
+    def __init__(self, url: str, client: "RpcClient"):
+        self.url = url
+        self.label = endpoint_label(url)
+        self.client = client
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+
+    def _update(self, failed: bool) -> None:
+        self.requests += 1
+        self.error_rate += EWMA_ALPHA * (float(failed) - self.error_rate)
+
+    def record_success(self, seconds: float) -> None:
+        # Latency is tracked on successes only; fast rejections (429s) would
+        # otherwise make a struggling endpoint look quick.
+        self._update(failed=False)
+        self._latencies.append(seconds)
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += EWMA_ALPHA * (seconds - self.latency)
+        self.consecutive_failures = 0
+        self.probing = False
+        metrics.RPC_REQUEST_SECONDS.observe(seconds, endpoint=self.label)
+        metrics.RPC_REQUESTS.inc(endpoint=self.label, outcome="ok")
+
+    def record_failure(self) -> None:
+        self._update(failed=True)
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.probing = False
+        metrics.RPC_REQUESTS.inc(endpoint=self.label, outcome="error")
+        # A failed half-open probe reopens the breaker for another cooldown.
+        if self.consecutive_failures >= CIRCUIT_BREAKER_FAILURES:
+            if not self.is_open():
+                metrics.RPC_CIRCUIT_OPENED.inc(endpoint=self.label)
+            self.open_until = time.monotonic() + CIRCUIT_BREAKER_COOLDOWN_SECONDS
+
+    def is_tripped(self) -> bool:
+        return self.consecutive_failures >= CIRCUIT_BREAKER_FAILURES
+
+    def is_open(self) -> bool:
+        return self.is_tripped() and time.monotonic() < self.open_until
+
+    def state(self) -> str:
+        if not self.is_tripped():
+            return "closed"
+        return "open" if self.is_open() else "half-open"
+
+    def available(self) -> bool:
+        # Closed, or half-open with no probe in flight yet.
+        if not self.is_tripped():
+            return True
+        return not self.is_open() and not self.probing
+
+    def start_request(self) -> None:
+        self.in_flight += 1
+        if self.is_tripped():
+            self.probing = True
+
+    def finish_request(self, cancelled: bool) -> None:
+        self.in_flight -= 1
+        if cancelled:
+            # Lost a hedge race; says nothing about the endpoint's health,
+            # and a cancelled probe frees the half-open slot for another.
+            self.probing = False
+            metrics.RPC_REQUESTS.inc(endpoint=self.label, outcome="cancelled")
+
+    def hedge_delay(self) -> float:
+        if len(self._latencies) < MIN_HEDGE_SAMPLES:
+            return DEFAULT_HEDGE_DELAY_SECONDS
+        latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(HEDGE_PERCENTILE * len(latencies)))
+        return latencies[index]
+
+    def expected_cost(self, default_latency: float) -> float:
+        latency = self.latency if self.latency is not None else default_latency
+        success_rate = max(MIN_SUCCESS_RATE, 1.0 - self.error_rate)
+        return latency * (1 + self.in_flight) / success_rate
+
+
+class RpcPool:
+    # Stands in for an RpcClient in the scanner: get_slot(), get_blocks()
+    # and is_connected() are routed through call(), and utils sends getBlock
+    # requests through call() with each endpoint's client.
+    def __init__(self, endpoints: List[str]):
+        if not endpoints:
+            raise ValueError("RpcPool needs at least one endpoint")
+        self.endpoints = [EndpointHealth(url, RpcClient(url)) for url in endpoints]
+
+    async def __aenter__(self) -> "RpcPool":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await asyncio.gather(
+            *(endpoint.client.close() for endpoint in self.endpoints),
+            return_exceptions=True,
+        )
+
+    def _has_spare(self, exclude: List[EndpointHealth]) -> bool:
+        return any(e not in exclude and e.available() for e in self.endpoints)
+
+    def _choose(
+        self, exclude: List[EndpointHealth], allow_open: bool = False
+    ) -> Optional[EndpointHealth]:
+        candidates = [
+            endpoint
+            for endpoint in self.endpoints
+            if endpoint not in exclude and endpoint.available()
+        ]
+        if not candidates and allow_open:
+            # No endpoint is available: rather than fail the request outright,
+            # try the one whose breaker reopens soonest.
+            remaining = [e for e in self.endpoints if e not in exclude]
+            if remaining:
+                return min(remaining, key=lambda endpoint: endpoint.open_until)
+        if not candidates:
+            return None
+
+        # Endpoints without samples yet are assumed as fast as the best one,
+        # so they get traffic and a latency estimate.
+        known = [e.latency for e in self.endpoints if e.latency is not None]
+        default_latency = min(known) if known else 1.0
+        weights = [
+            1.0 / max(endpoint.expected_cost(default_latency), 1e-6)
+            for endpoint in candidates
+        ]
+        return random.choices(candidates, weights=weights)[0]
+
+    async def _timed(self, endpoint: EndpointHealth, request: Request) -> Any:
+        started = time.perf_counter()
+        try:
+            result = await request(endpoint.client)
+        except Exception:
+            endpoint.record_failure()
+            raise
+        endpoint.record_success(time.perf_counter() - started)
+        return result
+
+    async def call(self, request: Request, hedge: bool = True) -> Any:
+        # Runs request(client) on a chosen endpoint. Failures move on to the
+        # next endpoint until every endpoint has been tried once.
+        attempted: List[EndpointHealth] = []
+        pending: Dict[asyncio.Task, float] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch(endpoint: EndpointHealth) -> None:
+            # Claimed before the task first runs, so concurrent calls see the
+            # in-flight request (and a half-open probe) straight away.
+            attempted.append(endpoint)
+            endpoint.start_request()
+            task = asyncio.ensure_future(self._timed(endpoint, request))
+            task.add_done_callback(
+                lambda task: endpoint.finish_request(task.cancelled())
+            )
+            pending[task] = time.monotonic() + endpoint.hedge_delay()
+
+        try:
+            while True:
+                if not pending:
+                    endpoint = self._choose(attempted, allow_open=True)
+                    if endpoint is None:
+                        raise last_error or RuntimeError("No RPC endpoint available")
+                    launch(endpoint)
+
+                timeout = None
+                if hedge and len(pending) == 1 and self._has_spare(attempted):
+                    hedge_at = next(iter(pending.values()))
+                    timeout = max(0.0, hedge_at - time.monotonic())
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    endpoint = self._choose(attempted)
+                    if endpoint is not None:
+                        metrics.RPC_HEDGED_REQUESTS.inc()
+                        launch(endpoint)
+                    continue
+
+                winner = None
+                for task in done:
+                    del pending[task]
+                    if task.exception() is None:
+                        winner = task
+                    else:
+                        last_error = task.exception()
+                if winner is not None:
+                    return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_slot(self):
+        return await self.call(lambda client: client.get_slot())
+
+    async def get_blocks(self, start_slot: int, end_slot: Optional[int] = None):
+        return await self.call(lambda client: client.get_blocks(start_slot, end_slot))
+
+    async def is_connected(self) -> bool:
+        results = await asyncio.gather(
+            *(endpoint.client.is_connected() for endpoint in self.endpoints),
+            return_exceptions=True,
+        )
+        return any(result is True for result in results)
+
+    def print_health_summary(self) -> None:
+        print("\n RPC ENDPOINTS")
+        print("-" * 70)
+        for endpoint in self.endpoints:
+            latency_ms = (endpoint.latency or 0.0) * 1000
+            print(
+                f"  {endpoint.label[:32]:<32} {endpoint.requests:>7} req "
+                f"{endpoint.failures:>5} err {latency_ms:>8.1f} ms "
+                f"breaker {endpoint.state()}"
+            )
+
+
+def create_rpc_client(endpoints: List[str]):
+    # A single endpoint keeps a plain client, without the pool's routing.
+    if len(endpoints) == 1:
+        return RpcClient(endpoints[0])
+    return RpcPool(endpoints)
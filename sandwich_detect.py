@@ -1,14 +1,39 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict, deque
 from datetime import datetime
+from itertools import groupby
 import json
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from swap_db import SwapDatabase, is_db_path
+from swap_store import (
+    PubkeyInterner,
+    SwapStore,
+    is_npz_path,
+    load_store_npz,
+    save_sandwiches_npz,
+)
 
 MAX_SLOT_GAP = 10
 MIN_SLOT_GAP = 1
+MAX_LEG_SLOT_GAP = 4
 RESULTS_DIR = Path("results")
 RESULTS_DIR.mkdir(exist_ok=True)
 DEFAULT_TRANSACTIONS_FILE = RESULTS_DIR / "transactions.json"
 DEFAULT_OUTPUT_FILE = RESULTS_DIR / "sandwich_attacks.json"
+JSONL_SUFFIX = ".jsonl"
 
 
 def is_opposite_direction(a, b):
@@ -26,73 +51,218 @@ def compute_price(tx):
         return None
 
 
-def detect_sandwiches(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    txs = sorted(transactions, key=lambda x: (x["slot"], x.get("tx_index", 99999)))
-
-    sandwiches = []
-    used_tx = set()
+def build_sandwich(frontrun, victim, back):
+    return {
+        "front_run": frontrun,
+        "victim": victim,
+        "back_run": back,
+        "attack_metadata": {
+            "slot_gap_front_to_victim": victim["slot"] - frontrun["slot"],
+            "slot_gap_victim_to_backrun": back["slot"] - victim["slot"],
+            "slot_gap_front_to_backrun": back["slot"] - frontrun["slot"],
+            "token_pair": [victim["token_in"], victim["token_out"]],
+            "bot_wallet": frontrun["signer"],
+            "victim_wallet": victim["signer"],
+            "is_opposite_direction": True,
+        },
+    }
 
-    for i, victim in enumerate(txs):
-        victim_slot = victim["slot"]
-        victim_signer = victim["signer"]
 
-        potential_frontruns = []
-        for j in range(i):
-            fr = txs[j]
+def detect_sandwich_legs(
+    slots: Sequence[int],
+    signer_ids: Sequence[Hashable],
+    token_in_ids: Sequence[Hashable],
+    token_out_ids: Sequence[Hashable],
+) -> List[Tuple[int, int, int]]:
+    # Columns must already be ordered by (slot, tx_index). Returns
+    # (front_run, victim, back_run) positions into those columns.
+    # Positions are appended in order, so every index list is ascending in
+    # both position and slot and can be windowed with bisect.
+    pair_positions = defaultdict(list)
+    pair_slots = defaultdict(list)
+    signer_positions = defaultdict(list)
+    for pos, (slot, signer, token_in, token_out) in enumerate(
+        zip(slots, signer_ids, token_in_ids, token_out_ids)
+    ):
+        pair = (token_in, token_out)
+        pair_positions[pair].append(pos)
+        pair_slots[pair].append(slot)
+        signer_positions[(signer, token_in, token_out)].append(pos)
+
+    legs = []
+
+    for i, victim_slot in enumerate(slots):
+        victim_signer = signer_ids[i]
+        token_in = token_in_ids[i]
+        token_out = token_out_ids[i]
+        pair = (token_in, token_out)
+
+        positions = pair_positions[pair]
+        hi = bisect_left(positions, i)
+        lo = bisect_left(pair_slots[pair], victim_slot - MAX_LEG_SLOT_GAP, 0, hi)
+
+        for j in positions[lo:hi]:
+            bot = signer_ids[j]
+            if bot == victim_signer:
+                continue
 
-            if fr["signer"] == victim_signer:
+            backruns = signer_positions.get((bot, token_out, token_in))
+            if not backruns:
                 continue
 
-            if victim_slot - fr["slot"] > 4:
+            k = bisect_right(backruns, i)
+            if k == len(backruns):
                 continue
 
-            if not is_same_direction(fr, victim):
+            back_pos = backruns[k]
+            if slots[back_pos] - victim_slot > MAX_LEG_SLOT_GAP:
                 continue
 
-            potential_frontruns.append(fr)
+            legs.append((j, i, back_pos))
+
+    return legs
+
+
+def detect_sandwiches(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    txs = sorted(transactions, key=lambda x: (x["slot"], x.get("tx_index", 99999)))
+
+    # Compare small ints instead of base58 strings in the hot loop.
+    interner = PubkeyInterner()
+    legs = detect_sandwich_legs(
+        [tx["slot"] for tx in txs],
+        [interner.intern(tx["signer"]) for tx in txs],
+        [interner.intern(tx["token_in"]) for tx in txs],
+        [interner.intern(tx["token_out"]) for tx in txs],
+    )
+
+    return [build_sandwich(txs[f], txs[v], txs[b]) for f, v, b in legs]
 
-        for frontrun in potential_frontruns:
 
+def detect_store_sandwiches(store: SwapStore) -> List[Tuple[int, int, int]]:
+    order = store.sort_order()
+    legs = detect_sandwich_legs(
+        [store.slots[i] for i in order],
+        [store.signer_ids[i] for i in order],
+        [store.mint_in_ids[i] for i in order],
+        [store.mint_out_ids[i] for i in order],
+    )
+    return [(order[f], order[v], order[b]) for f, v, b in legs]
+
+
+def build_store_sandwich(store: SwapStore, legs: Tuple[int, int, int]) -> Dict[str, Any]:
+    front, victim, back = legs
+    return build_sandwich(store.record(front), store.record(victim), store.record(back))
+
+
+class StreamingSandwichDetector:
+    def __init__(self, leg_slot_gap: int = MAX_LEG_SLOT_GAP):
+        if leg_slot_gap > MAX_SLOT_GAP:
+            raise ValueError("leg_slot_gap cannot exceed MAX_SLOT_GAP")
+        self.leg_slot_gap = leg_slot_gap
+        self.last_slot = None
+
+        # Front-run candidates per (token_in, token_out), oldest first.
+        self._recent = defaultdict(deque)
+        self._recent_order = deque()
+        # Open (front-run, victim) pairs keyed by the back-run they wait for:
+        # (bot, token_in, token_out) of the closing swap.
+        self._pending = defaultdict(deque)
+        self._pending_order = deque()
+
+    def _evict(self, slot: int) -> None:
+        oldest_slot = slot - self.leg_slot_gap
+
+        while self._recent_order and self._recent_order[0][0] < oldest_slot:
+            _, pair = self._recent_order.popleft()
+            candidates = self._recent[pair]
+            candidates.popleft()
+            if not candidates:
+                del self._recent[pair]
+
+        while self._pending_order and self._pending_order[0][0] < oldest_slot:
+            _, key = self._pending_order.popleft()
+            pairs = self._pending.get(key)
+            if not pairs:
+                continue
+            while pairs and pairs[0][1]["slot"] < oldest_slot:
+                pairs.popleft()
+            if not pairs:
+                del self._pending[key]
+
+    def _close_pending(self, tx: Dict[str, Any]) -> List[Dict[str, Any]]:
+        pairs = self._pending.pop((tx["signer"], tx["token_in"], tx["token_out"]), None)
+        if not pairs:
+            return []
+        return [build_sandwich(frontrun, victim, tx) for frontrun, victim in pairs]
+
+    def _open_pending(self, victim: Dict[str, Any]) -> None:
+        for frontrun in self._recent.get((victim["token_in"], victim["token_out"]), ()):
             bot = frontrun["signer"]
+            if bot == victim["signer"]:
+                continue
+            key = (bot, victim["token_out"], victim["token_in"])
+            self._pending[key].append((frontrun, victim))
+            self._pending_order.append((victim["slot"], key))
+
+    def _remember(self, tx: Dict[str, Any]) -> None:
+        pair = (tx["token_in"], tx["token_out"])
+        self._recent[pair].append(tx)
+        self._recent_order.append((tx["slot"], pair))
 
-            for k in range(i + 1, len(txs)):
-                back = txs[k]
+    def process_slot(
+        self, slot: int, swaps: Iterable[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        if self.last_slot is not None and slot <= self.last_slot:
+            raise ValueError(
+                f"Slots must be processed in increasing order: {slot} after {self.last_slot}"
+            )
 
-                if back["slot"] - victim_slot > 4:
-                    break
+        self._evict(slot)
+        self.last_slot = slot
 
-                if back["signer"] != bot:
-                    continue
+        sandwiches = []
+        for tx in sorted(swaps, key=lambda x: x.get("tx_index", 99999)):
+            sandwiches.extend(self._close_pending(tx))
+            self._open_pending(tx)
+            self._remember(tx)
 
-                if not is_opposite_direction(back, victim):
-                    continue
+        return sandwiches
 
-                sandwich = {
-                    "front_run": frontrun,
-                    "victim": victim,
-                    "back_run": back,
-                    "attack_metadata": {
-                        "slot_gap_front_to_victim": victim["slot"] - frontrun["slot"],
-                        "slot_gap_victim_to_backrun": back["slot"] - victim["slot"],
-                        "slot_gap_front_to_backrun": back["slot"] - frontrun["slot"],
-                        "token_pair": [victim["token_in"], victim["token_out"]],
-                        "bot_wallet": bot,
-                        "victim_wallet": victim_signer,
-                        "is_opposite_direction": True,
-                    },
-                }
 
-                sandwiches.append(sandwich)
-                used_tx.add(frontrun["signature"])
-                used_tx.add(victim["signature"])
-                used_tx.add(back["signature"])
+def detect_sandwiches_streaming(
+    transactions: Iterable[Dict[str, Any]],
+) -> Iterator[Dict[str, Any]]:
+    # Transactions must arrive in slot order, as written by the scanner.
+    detector = StreamingSandwichDetector()
+    for slot, swaps in groupby(transactions, key=itemgetter("slot")):
+        yield from detector.process_slot(slot, list(swaps))
 
-                break
 
-    return sandwiches
+def is_jsonl_path(path) -> bool:
+    return Path(path).suffix == JSONL_SUFFIX
+
+
+def iter_transactions(filepath=DEFAULT_TRANSACTIONS_FILE) -> Iterator[Dict[str, Any]]:
+    path = Path(filepath)
+    if not path.exists():
+        raise FileNotFoundError(f"Transactions file not found: {filepath}")
+
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A scan killed mid-write can leave a truncated last line.
+                continue
 
 
 def load_transactions(filepath=DEFAULT_TRANSACTIONS_FILE) -> List[Dict[str, Any]]:
+    if is_jsonl_path(filepath):
+        return list(iter_transactions(filepath))
+
     path = Path(filepath)
     if not path.exists():
         raise FileNotFoundError(f"Transactions file not found: {filepath}")
@@ -129,6 +299,66 @@ def save_sandwich_results(
     print(f"Unique bot wallets: {output_data['summary']['unique_bot_wallets']}")
 
 
+def sandwich_legs_in_store(
+    store: SwapStore, sandwiches: List[Dict[str, Any]]
+) -> List[Tuple[int, int, int]]:
+    row_by_signature = {signature: i for i, signature in enumerate(store.signatures)}
+    return [
+        (
+            row_by_signature[s["front_run"]["signature"]],
+            row_by_signature[s["victim"]["signature"]],
+            row_by_signature[s["back_run"]["signature"]],
+        )
+        for s in sandwiches
+    ]
+
+
+def save_sandwich_results_npz(
+    store: SwapStore,
+    legs: List[Tuple[int, int, int]],
+    output_file,
+) -> None:
+    save_sandwiches_npz(output_file, store, legs)
+
+    bot_wallets = set(store.signer_ids[front] for front, _, _ in legs)
+
+    print(f"\nSandwich detection results saved to: {Path(output_file).absolute()}")
+    print(f"Total sandwiches detected: {len(legs)}")
+    print(f"Unique bot wallets: {len(bot_wallets)}")
+
+
+def count_transactions(transactions: Iterable[Dict[str, Any]], counter: Dict[str, int]):
+    for tx in transactions:
+        counter["transactions"] += 1
+        yield tx
+
+
+def save_sandwiches_to_db(sandwiches: List[Dict[str, Any]], db_file) -> None:
+    with SwapDatabase(db_file) as db:
+        db.insert_sandwiches(sandwiches)
+        total = db.count("sandwiches")
+    print(f"\nSandwich detection results saved to: {Path(db_file).absolute()}")
+    print(f"Sandwiches written: {len(sandwiches)} ({total} stored)")
+
+
+def load_db_sandwiches(
+    db: SwapDatabase,
+    start_slot: Optional[int] = None,
+    end_slot: Optional[int] = None,
+    bot: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return [
+        build_sandwich(*legs) for legs in db.sandwich_legs(start_slot, end_slot, bot)
+    ]
+
+
+def save_detected_sandwiches(sandwiches: List[Dict[str, Any]], output_file) -> None:
+    if is_db_path(output_file):
+        save_sandwiches_to_db(sandwiches, output_file)
+    else:
+        save_sandwich_results(sandwiches, output_file)
+
+
 def run_detection(
     transactions_file=DEFAULT_TRANSACTIONS_FILE,
     output_file=DEFAULT_OUTPUT_FILE,
@@ -140,22 +370,70 @@ def run_detection(
     print("WIDE SANDWICH ATTACK DETECTION")
     print("=" * 70)
 
+    # JSONL and database input is read lazily and detected slot by slot, so
+    # memory is bounded by the detection window rather than the input size.
+    streaming = (
+        is_jsonl_path(transactions_file) or is_db_path(transactions_file)
+    ) and not is_npz_path(output_file)
+    db = None
+
     print(f"\nLoading transactions from: {transactions_file}")
-    transactions = load_transactions(transactions_file)
-    print(f"Loaded {len(transactions)} transactions")
+    if streaming:
+        counter = {"transactions": 0}
+        if is_db_path(transactions_file):
+            db = SwapDatabase(transactions_file)
+            transactions = count_transactions(db.iter_swaps(), counter)
+        else:
+            transactions = count_transactions(
+                iter_transactions(transactions_file), counter
+            )
+        print("Streaming transactions slot by slot")
+    else:
+        if is_npz_path(transactions_file):
+            transactions = load_store_npz(transactions_file)
+        else:
+            transactions = load_transactions(transactions_file)
+        print(f"Loaded {len(transactions)} transactions")
 
     print(f"\nDetecting wide sandwich attacks...")
     print(f"  Max slot gap: {max_slot_gap}")
     print(f"  Min slot gap: {min_slot_gap}")
 
-    sandwiches = detect_sandwiches(
-        transactions,
-    )
-
-    print(f"Found {len(sandwiches)} potential sandwich attacks")
-
-    print(f"\nDetecting bundle back-run patterns...")
-    save_sandwich_results(sandwiches, output_file)
+    if streaming:
+        try:
+            sandwiches = list(detect_sandwiches_streaming(transactions))
+        finally:
+            if db is not None:
+                db.close()
+        print(f"Streamed {counter['transactions']} transactions")
+        print(f"Found {len(sandwiches)} potential sandwich attacks")
+
+        print(f"\nDetecting bundle back-run patterns...")
+        save_detected_sandwiches(sandwiches, output_file)
+    elif isinstance(transactions, SwapStore) or is_npz_path(output_file):
+        store = (
+            transactions
+            if isinstance(transactions, SwapStore)
+            else SwapStore.from_records(transactions)
+        )
+        legs = detect_store_sandwiches(store)
+        print(f"Found {len(legs)} potential sandwich attacks")
+
+        print(f"\nDetecting bundle back-run patterns...")
+        if is_npz_path(output_file):
+            save_sandwich_results_npz(store, legs, output_file)
+        else:
+            sandwiches = [build_store_sandwich(store, leg) for leg in legs]
+            save_detected_sandwiches(sandwiches, output_file)
+    else:
+        sandwiches = detect_sandwiches(
+            transactions,
+        )
+
+        print(f"Found {len(sandwiches)} potential sandwich attacks")
+
+        print(f"\nDetecting bundle back-run patterns...")
+        save_detected_sandwiches(sandwiches, output_file)
 
     print("\n" + "=" * 70)
     print("Detection complete")
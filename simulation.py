@@ -1,11 +1,30 @@
 import json
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from pool_models import (
+    BinLiquidityPool,
+    ConstantProductPool,
+    model_class_for,
+    simulate_sandwich,
+)
 
 SOL_MINT = "So11111111111111111111111111111111111111112"
 TOKEN_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
 RESULTS_DIR = Path("results")
 RESULTS_DIR.mkdir(exist_ok=True)
+DEFAULT_SANDWICH_FILE = RESULTS_DIR / "sandwich_attacks.json"
+DEFAULT_OPTIMAL_SIZE_FILE = RESULTS_DIR / "optimal_front_run.json"
+# Assumed victim slippage tolerance when sizing the optimal front-run. The
+# victim's realized output always caps it, since their minimum output can't
+# have been above what they received.
+DEFAULT_VICTIM_SLIPPAGE_BPS = 50
+DEFAULT_VICTIM_LOSS_FILE = RESULTS_DIR / "victim_loss.json"
+# Pool fee assumed when replaying detected sandwiches (Raydium AMM's 0.25%)
+DEFAULT_POOL_FEE_BPS = 25
 
 
 @dataclass
@@ -118,6 +137,397 @@ def run_simulation(
     return result
 
 
+def simulate_sandwich_batch(
+    token_reserve,
+    sol_reserve,
+    bot_sol_spend,
+    victim_sol_spend,
+) -> Dict[str, np.ndarray]:
+    # Same constant-product steps as run_simulation, evaluated elementwise
+    # over broadcast arrays instead of on a mutable PoolState.
+    token_reserve = np.asarray(token_reserve, dtype=np.float64)
+    sol_reserve = np.asarray(sol_reserve, dtype=np.float64)
+    bot_sol_spend = np.asarray(bot_sol_spend, dtype=np.float64)
+    victim_sol_spend = np.asarray(victim_sol_spend, dtype=np.float64)
+
+    cp = token_reserve * sol_reserve
+    initial_price = sol_reserve / token_reserve
+
+    sol_after_front = sol_reserve + bot_sol_spend
+    token_after_front = cp / sol_after_front
+    token_acquired = token_reserve - token_after_front
+
+    sol_after_victim = sol_after_front + victim_sol_spend
+    token_after_victim = cp / sol_after_victim
+    victim_token_out = token_after_front - token_after_victim
+
+    token_after_back = token_after_victim + token_acquired
+    sol_after_back = cp / token_after_back
+    sol_returned = sol_after_victim - sol_after_back
+
+    # What the victim would have received with no front-run in the pool.
+    victim_clean_token_out = token_reserve - cp / (sol_reserve + victim_sol_spend)
+
+    return {
+        "initial_price": initial_price,
+        "final_price": sol_after_back / token_after_back,
+        "token_acquired": token_acquired,
+        "victim_token_out": victim_token_out,
+        "bot_profit_sol": sol_returned - bot_sol_spend,
+        "victim_loss_tokens": victim_sol_spend / initial_price - victim_token_out,
+        "victim_sandwich_loss_tokens": victim_clean_token_out - victim_token_out,
+    }
+
+
+def sweep_sandwich_grid(
+    token_reserves,
+    sol_reserves,
+    bot_sol_spends,
+    victim_sol_spends,
+) -> Dict[str, np.ndarray]:
+    # token_reserves[i] and sol_reserves[i] describe pool i. Every pool is
+    # combined with every bot and victim size, so each returned surface has
+    # shape (pools, bot sizes, victim sizes).
+    token_reserves = np.atleast_1d(np.asarray(token_reserves, dtype=np.float64))
+    sol_reserves = np.atleast_1d(np.asarray(sol_reserves, dtype=np.float64))
+    if token_reserves.shape != sol_reserves.shape:
+        raise ValueError("token_reserves and sol_reserves must have the same length")
+
+    bot_sol_spends = np.atleast_1d(np.asarray(bot_sol_spends, dtype=np.float64))
+    victim_sol_spends = np.atleast_1d(np.asarray(victim_sol_spends, dtype=np.float64))
+
+    surfaces = simulate_sandwich_batch(
+        token_reserves[:, None, None],
+        sol_reserves[:, None, None],
+        bot_sol_spends[None, :, None],
+        victim_sol_spends[None, None, :],
+    )
+    shape = (len(token_reserves), len(bot_sol_spends), len(victim_sol_spends))
+    return {name: np.broadcast_to(values, shape) for name, values in surfaces.items()}
+
+
+def infer_reserves(
+    front_amount_in,
+    front_amount_out,
+    victim_amount_in,
+    victim_amount_out,
+    fee_rate: float = 0.0,
+):
+    # Solves the two constant-product equations of a front-run (x in, y out)
+    # followed by a same-direction victim (v in, w out) for the pool's
+    # reserves before the front-run: X of the input token, Y of the output.
+    # With x' and v' the inputs net of the fee, which stays in the pool:
+    #   X = w (x + v') / (y v' / x' - w),  Y = y (X + x') / x'
+    # Returns NaN where the legs are inconsistent with such a pool.
+    x = np.asarray(front_amount_in, dtype=np.float64)
+    y = np.asarray(front_amount_out, dtype=np.float64)
+    v = np.asarray(victim_amount_in, dtype=np.float64)
+    w = np.asarray(victim_amount_out, dtype=np.float64)
+    x_net = x * (1 - fee_rate)
+    v_net = v * (1 - fee_rate)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denominator = y * v_net / x_net - w
+        input_reserve = w * (x + v_net) / denominator
+        output_reserve = y * (input_reserve + x_net) / x_net
+
+    valid = (denominator > 0) & (input_reserve > 0) & np.isfinite(output_reserve)
+    return (
+        np.where(valid, input_reserve, np.nan),
+        np.where(valid, output_reserve, np.nan),
+    )
+
+
+def optimal_front_run_size(
+    input_reserve,
+    output_reserve,
+    victim_amount_in,
+    victim_min_out,
+):
+    # Without fees the sandwich profit grows with the front-run size, so the
+    # optimum is the largest front-run that still leaves the victim their
+    # minimum output. With u = X + b that is
+    #   k v / (u (u + v)) = m  =>  u = (-v + sqrt(v^2 + 4 k v / m)) / 2
+    X = np.asarray(input_reserve, dtype=np.float64)
+    Y = np.asarray(output_reserve, dtype=np.float64)
+    v = np.asarray(victim_amount_in, dtype=np.float64)
+    m = np.asarray(victim_min_out, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        u = (-v + np.sqrt(v * v + 4 * X * Y * v / m)) / 2
+    return np.maximum(u - X, 0.0)
+
+
+def sandwich_leg_arrays(sandwiches: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    # Front-run and victim amounts of sandwiches whose front-run and victim
+    # trade in the same direction; the rest are NaN.
+    rows = []
+    for s in sandwiches:
+        fr = s.get("front_run") or {}
+        victim = s.get("victim") or {}
+        try:
+            same_direction = (
+                fr["token_in"] == victim["token_in"]
+                and fr["token_out"] == victim["token_out"]
+            )
+            amounts = (
+                float(fr["amount_in"]),
+                float(fr["amount_out"]),
+                float(victim["amount_in"]),
+                float(victim["amount_out"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            same_direction = False
+        rows.append(amounts if same_direction else (np.nan,) * 4)
+
+    legs = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    return {
+        "front_amount_in": legs[:, 0],
+        "front_amount_out": legs[:, 1],
+        "victim_amount_in": legs[:, 2],
+        "victim_amount_out": legs[:, 3],
+    }
+
+
+def solve_optimal_front_runs(
+    sandwiches: List[Dict[str, Any]],
+    slippage_bps: float = DEFAULT_VICTIM_SLIPPAGE_BPS,
+) -> Dict[str, np.ndarray]:
+    # Amounts are in the front-run's input token, which is what a bot
+    # spends and gets back.
+    legs = sandwich_leg_arrays(sandwiches)
+    x = legs["front_amount_in"]
+    v = legs["victim_amount_in"]
+    w = legs["victim_amount_out"]
+
+    input_reserve, output_reserve = infer_reserves(
+        x, legs["front_amount_out"], v, w
+    )
+    clean_out = output_reserve * v / (input_reserve + v)
+    victim_min_out = np.minimum(w, clean_out * (1 - slippage_bps / 10_000))
+    optimal = optimal_front_run_size(input_reserve, output_reserve, v, victim_min_out)
+
+    actual = simulate_sandwich_batch(output_reserve, input_reserve, x, v)
+    best = simulate_sandwich_batch(output_reserve, input_reserve, optimal, v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        size_ratio = x / optimal
+
+    return {
+        "input_reserve": input_reserve,
+        "output_reserve": output_reserve,
+        "victim_min_out": victim_min_out,
+        "actual_front_run": x,
+        "optimal_front_run": optimal,
+        "size_ratio": size_ratio,
+        "actual_profit": actual["bot_profit_sol"],
+        "optimal_profit": best["bot_profit_sol"],
+    }
+
+
+def sandwich_pool_models(sandwiches: List[Dict[str, Any]]) -> List[Optional[type]]:
+    # Model class of the pool each victim traded on, None when unknown
+    # (e.g. Jupiter routes).
+    models = []
+    for s in sandwiches:
+        victim = s.get("victim") or {}
+        models.append(
+            model_class_for(victim.get("pool_name"))
+            or model_class_for(victim.get("swap_program"))
+        )
+    return models
+
+
+def replay_victim_losses(
+    sandwiches: List[Dict[str, Any]],
+    fee_rate: float = DEFAULT_POOL_FEE_BPS / 10_000,
+) -> Dict[str, np.ndarray]:
+    # Re-simulates every sandwich against reserves inferred from its own
+    # front-run and victim legs. The victim's loss is what the same swap
+    # would have returned without the front-run minus what they actually
+    # got, in the victim's output token; its value is taken at the
+    # pre-attack price in the victim's input token.
+    # Reserves are inferred with constant-product math, which also holds for
+    # a concentrated-liquidity pool within one tick range (its virtual
+    # reserves) and is assumed for unknown pools. Constant-sum DLMM bins
+    # can't be recovered from two swaps, so those sandwiches stay NaN.
+    legs = sandwich_leg_arrays(sandwiches)
+    replayable = np.array(
+        [model is not BinLiquidityPool for model in sandwich_pool_models(sandwiches)],
+        dtype=bool,
+    )
+    x = np.where(replayable, legs["front_amount_in"], np.nan)
+    v = legs["victim_amount_in"]
+    w = legs["victim_amount_out"]
+
+    input_reserve, output_reserve = infer_reserves(
+        x, legs["front_amount_out"], v, w, fee_rate
+    )
+    pool = ConstantProductPool(input_reserve, output_reserve, fee_rate)
+    replayed = simulate_sandwich(pool, x, v, zero_for_one=True)
+
+    clean_out = replayed["victim_clean_amount_out"]
+    victim_loss = clean_out - w
+    with np.errstate(divide="ignore", invalid="ignore"):
+        loss_fraction = victim_loss / clean_out
+        loss_input_value = victim_loss * input_reserve / output_reserve
+
+    return {
+        "input_reserve": input_reserve,
+        "output_reserve": output_reserve,
+        "victim_actual_out": w,
+        "victim_clean_out": clean_out,
+        "victim_loss": victim_loss,
+        "victim_loss_fraction": loss_fraction,
+        "victim_loss_input_value": loss_input_value,
+        "bot_profit": replayed["bot_profit"],
+    }
+
+
+def _finite_or_none(value: float) -> Optional[float]:
+    return value if np.isfinite(value) else None
+
+
+def load_sandwich_file(sandwich_file) -> List[Dict[str, Any]]:
+    with Path(sandwich_file).open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("sandwiches", []) if isinstance(data, dict) else data
+
+
+def run_victim_loss_replay(
+    sandwiches: List[Dict[str, Any]],
+    output_file=DEFAULT_VICTIM_LOSS_FILE,
+    fee_bps: float = DEFAULT_POOL_FEE_BPS,
+) -> None:
+    print("\n" + "=" * 70)
+    print("COUNTERFACTUAL VICTIM LOSS")
+    print("=" * 70)
+    print(f"\nReplaying {len(sandwiches)} sandwiches ({fee_bps} bps pool fee)")
+
+    replayed = replay_victim_losses(sandwiches, fee_bps / 10_000)
+    solvable = np.isfinite(replayed["victim_loss"])
+    pool_models = sandwich_pool_models(sandwiches)
+    bin_pools = sum(model is BinLiquidityPool for model in pool_models)
+    skipped = len(sandwiches) - int(solvable.sum()) - bin_pools
+    print(f"Replayed {int(solvable.sum())} sandwiches")
+    if bin_pools:
+        print(f"  Skipped {bin_pools} on DLMM bin pools")
+    if skipped:
+        print(f"  Skipped {skipped} with legs that don't fit a constant-product pool")
+
+    columns = {name: values.tolist() for name, values in replayed.items()}
+    results = []
+    # Victim input mint -> totals, since loss values are in that token.
+    by_input_token: Dict[str, Dict[str, float]] = {}
+    for i in np.flatnonzero(solvable).tolist():
+        s = sandwiches[i]
+        victim = s["victim"]
+        row = {
+            "sandwich_index": i,
+            "front_run_signature": s["front_run"].get("signature"),
+            "victim_signature": victim.get("signature"),
+            "back_run_signature": s["back_run"].get("signature"),
+            "victim_wallet": victim.get("signer"),
+            "token_in": victim["token_in"],
+            "token_out": victim["token_out"],
+            "pool_model": pool_models[i].__name__ if pool_models[i] else None,
+        }
+        row.update(
+            {name: _finite_or_none(values[i]) for name, values in columns.items()}
+        )
+        results.append(row)
+
+        totals = by_input_token.setdefault(
+            victim["token_in"], {"sandwich_count": 0, "victim_loss_input_value": 0.0}
+        )
+        totals["sandwich_count"] += 1
+        totals["victim_loss_input_value"] += row["victim_loss_input_value"] or 0.0
+
+    if results:
+        fractions = replayed["victim_loss_fraction"][solvable]
+        print(f"\nMedian victim loss: {np.median(fractions) * 100:.3f}% of output")
+        sol_totals = by_input_token.get(SOL_MINT)
+        if sol_totals:
+            print(
+                f"SOL-input victims lost {sol_totals['victim_loss_input_value']:,.6f} "
+                f"SOL across {sol_totals['sandwich_count']} sandwiches"
+            )
+
+    with Path(output_file).open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "fee_bps": fee_bps,
+                "by_input_token": by_input_token,
+                "sandwiches": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nVictim losses saved to: {output_file}\n")
+
+
+def run_optimal_size_analysis(
+    sandwich_file=DEFAULT_SANDWICH_FILE,
+    output_file=DEFAULT_OPTIMAL_SIZE_FILE,
+    slippage_bps: float = DEFAULT_VICTIM_SLIPPAGE_BPS,
+) -> None:
+    print("\n" + "=" * 70)
+    print("OPTIMAL FRONT-RUN SIZING")
+    print("=" * 70)
+
+    sandwiches = load_sandwich_file(sandwich_file)
+    print(f"\nLoaded {len(sandwiches)} sandwiches from: {sandwich_file}")
+    print(f"Victim slippage tolerance: {slippage_bps} bps (capped at realized output)")
+
+    solved = solve_optimal_front_runs(sandwiches, slippage_bps)
+    solvable = np.isfinite(solved["optimal_front_run"])
+    print(f"Solved {int(solvable.sum())} sandwiches")
+    if len(sandwiches) - int(solvable.sum()):
+        print(
+            f"  Skipped {len(sandwiches) - int(solvable.sum())} with legs that don't "
+            "fit a constant-product pool"
+        )
+
+    columns = {name: values.tolist() for name, values in solved.items()}
+    results = []
+    per_bot: Dict[str, List[float]] = {}
+    for i in np.flatnonzero(solvable).tolist():
+        s = sandwiches[i]
+        bot = s.get("attack_metadata", {}).get("bot_wallet") or s["front_run"].get(
+            "signer"
+        )
+        row = {"sandwich_index": i, "bot": bot}
+        row.update(
+            {name: _finite_or_none(values[i]) for name, values in columns.items()}
+        )
+        results.append(row)
+        if row["size_ratio"] is not None:
+            per_bot.setdefault(bot, []).append(row["size_ratio"])
+
+    bots = {
+        bot: {
+            "sandwich_count": len(ratios),
+            "median_size_ratio": float(np.median(ratios)),
+        }
+        for bot, ratios in per_bot.items()
+    }
+
+    if results:
+        ratios = np.array([r["size_ratio"] for r in results if r["size_ratio"]])
+        print(f"\nMedian actual/optimal front-run size: {np.median(ratios):.3f}")
+        print(
+            f"Profit captured: {sum(r['actual_profit'] for r in results):,.6f} "
+            f"of {sum(r['optimal_profit'] for r in results):,.6f} (input-token units)"
+        )
+
+    with Path(output_file).open("w", encoding="utf-8") as f:
+        json.dump(
+            {"slippage_bps": slippage_bps, "bots": bots, "sandwiches": results},
+            f,
+            indent=2,
+        )
+    print(f"\nOptimal sizes saved to: {output_file}\n")
+
+
 def print_simulation_summary(result: dict, pool: PoolState) -> None:
     print("\n" + "=" * 70)
     print("WIDE SANDWICH ATTACK SIMULATION")
@@ -197,4 +607,38 @@ def save_simulation():
 
 
 if __name__ == "__main__":
-    save_simulation()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sandwich attack simulation")
+    parser.add_argument(
+        "--optimal-sizes",
+        nargs="?",
+        const=DEFAULT_SANDWICH_FILE,
+        default=None,
+        metavar="SANDWICH_FILE",
+        help="Compare each detected sandwich's front-run size with the "
+        "profit-maximizing one",
+    )
+    parser.add_argument(
+        "--slippage-bps", type=float, default=DEFAULT_VICTIM_SLIPPAGE_BPS
+    )
+    parser.add_argument(
+        "--victim-loss",
+        nargs="?",
+        const=DEFAULT_SANDWICH_FILE,
+        default=None,
+        metavar="SANDWICH_FILE",
+        help="Replay each detected sandwich without its front-run to estimate "
+        "the victim's loss",
+    )
+    parser.add_argument("--fee-bps", type=float, default=DEFAULT_POOL_FEE_BPS)
+    args = parser.parse_args()
+
+    if args.victim_loss:
+        run_victim_loss_replay(
+            load_sandwich_file(args.victim_loss), fee_bps=args.fee_bps
+        )
+    elif args.optimal_sizes:
+        run_optimal_size_analysis(args.optimal_sizes, slippage_bps=args.slippage_bps)
+    else:
+        save_simulation()
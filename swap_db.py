@@ -0,0 +1,309 @@
+"""
+Embedded SQLite Storage
+
+One database file holding swaps, detected sandwiches and computed profits,
+indexed for the lookups investigations need (slot ranges, signer, mint pair,
+bot). Rows are keyed by signature, so re-inserting a block or re-running an
+analysis updates rows instead of duplicating them.
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+RESULTS_DIR = Path("results")
+DEFAULT_DB_FILE = RESULTS_DIR / "mev.sqlite3"
+DB_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+
+# Same order as utils.SWAP_RECORD_FIELDS
+SWAP_COLUMNS = (
+    "signature",
+    "slot",
+    "tx_index",
+    "signer",
+    "swap_program",
+    "pool_name",
+    "token_in",
+    "token_out",
+    "amount_in",
+    "amount_out",
+    "user_source_ata",
+    "user_destination_ata",
+    "priority_fee",
+    "tip_account",
+    "tip_amount",
+    "block_time",
+)
+SANDWICH_COLUMNS = (
+    "front_run_signature",
+    "victim_signature",
+    "back_run_signature",
+    "slot",
+    "back_run_slot",
+    "bot",
+    "victim_wallet",
+    "token_in",
+    "token_out",
+)
+PROFIT_COLUMNS = (
+    "front_run_signature",
+    "victim_signature",
+    "back_run_signature",
+    "bot",
+    "token_spent",
+    "token_received",
+    "amount_spent",
+    "amount_received",
+    "profit_raw",
+    "profit_usd",
+    "profit_sol",
+    "price_usd",
+    "priced_at",
+)
+LEG_KEYS = ("front_run", "victim", "back_run")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS swaps (
+    signature TEXT PRIMARY KEY,
+    slot INTEGER NOT NULL,
+    tx_index INTEGER,
+    signer TEXT NOT NULL,
+    swap_program TEXT,
+    pool_name TEXT,
+    token_in TEXT NOT NULL,
+    token_out TEXT NOT NULL,
+    amount_in REAL NOT NULL,
+    amount_out REAL NOT NULL,
+    user_source_ata TEXT,
+    user_destination_ata TEXT,
+    priority_fee INTEGER,
+    tip_account TEXT,
+    tip_amount INTEGER,
+    block_time INTEGER
+);
+CREATE INDEX IF NOT EXISTS swaps_slot ON swaps (slot, tx_index);
+CREATE INDEX IF NOT EXISTS swaps_signer ON swaps (signer, slot);
+CREATE INDEX IF NOT EXISTS swaps_pair ON swaps (token_in, token_out, slot);
+
+CREATE TABLE IF NOT EXISTS sandwiches (
+    front_run_signature TEXT NOT NULL,
+    victim_signature TEXT NOT NULL,
+    back_run_signature TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    back_run_slot INTEGER NOT NULL,
+    bot TEXT NOT NULL,
+    victim_wallet TEXT,
+    token_in TEXT NOT NULL,
+    token_out TEXT NOT NULL,
+    PRIMARY KEY (front_run_signature, victim_signature, back_run_signature)
+);
+CREATE INDEX IF NOT EXISTS sandwiches_slot ON sandwiches (slot);
+CREATE INDEX IF NOT EXISTS sandwiches_bot ON sandwiches (bot, slot);
+CREATE INDEX IF NOT EXISTS sandwiches_pair ON sandwiches (token_in, token_out, slot);
+
+CREATE TABLE IF NOT EXISTS profits (
+    front_run_signature TEXT NOT NULL,
+    victim_signature TEXT NOT NULL,
+    back_run_signature TEXT NOT NULL,
+    bot TEXT NOT NULL,
+    token_spent TEXT,
+    token_received TEXT,
+    amount_spent REAL,
+    amount_received REAL,
+    profit_raw REAL,
+    profit_usd REAL,
+    profit_sol REAL,
+    price_usd REAL,
+    priced_at INTEGER,
+    PRIMARY KEY (front_run_signature, victim_signature, back_run_signature)
+);
+CREATE INDEX IF NOT EXISTS profits_bot ON profits (bot, priced_at);
+CREATE INDEX IF NOT EXISTS profits_priced_at ON profits (priced_at);
+"""
+
+
+def is_db_path(path) -> bool:
+    return Path(path).suffix in DB_SUFFIXES
+
+
+def _insert_sql(
+    table: str, columns: Tuple[str, ...], conflict: str = "REPLACE"
+) -> str:
+    placeholders = ", ".join("?" for _ in columns)
+    return (
+        f"INSERT OR {conflict} INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({placeholders})"
+    )
+
+
+def _range_clause(
+    column: str, start: Optional[int], end: Optional[int], params: List[Any]
+) -> List[str]:
+    clauses = []
+    if start is not None:
+        clauses.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append(f"{column} <= ?")
+        params.append(end)
+    return clauses
+
+
+class SwapDatabase:
+    def __init__(self, path=DEFAULT_DB_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL lets ad-hoc readers query while the scanner is writing.
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SwapDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Writes. Each call is one transaction, so the scanner commits once per
+    # block rather than once per swap.
+
+    def insert_swaps(self, swaps: Iterable[Dict[str, Any]]) -> None:
+        with self.conn:
+            self.conn.executemany(
+                _insert_sql("swaps", SWAP_COLUMNS),
+                ([swap.get(name) for name in SWAP_COLUMNS] for swap in swaps),
+            )
+
+    def insert_sandwiches(self, sandwiches: Iterable[Dict[str, Any]]) -> None:
+        rows = []
+        legs = []
+        for s in sandwiches:
+            front, victim, back = (s[key] for key in LEG_KEYS)
+            metadata = s.get("attack_metadata", {})
+            rows.append(
+                (
+                    front["signature"],
+                    victim["signature"],
+                    back["signature"],
+                    front["slot"],
+                    back["slot"],
+                    metadata.get("bot_wallet") or front["signer"],
+                    metadata.get("victim_wallet") or victim.get("signer"),
+                    victim["token_in"],
+                    victim["token_out"],
+                )
+            )
+            legs.extend((front, victim, back))
+
+        with self.conn:
+            # Legs are stored too, so sandwiches loaded from JSON can still
+            # be joined back to their swaps.
+            self.conn.executemany(
+                _insert_sql("swaps", SWAP_COLUMNS, conflict="IGNORE"),
+                ([leg.get(name) for name in SWAP_COLUMNS] for leg in legs),
+            )
+            self.conn.executemany(_insert_sql("sandwiches", SANDWICH_COLUMNS), rows)
+
+    def insert_profits(self, results: Iterable[Dict[str, Any]]) -> None:
+        # Accepts profit rows that carry either *_signature fields or the
+        # full leg dicts.
+        rows = []
+        for r in results:
+            signatures = [
+                r.get(f"{key}_signature") or (r.get(key) or {}).get("signature")
+                for key in LEG_KEYS
+            ]
+            rows.append(signatures + [r.get(name) for name in PROFIT_COLUMNS[3:]])
+        with self.conn:
+            self.conn.executemany(_insert_sql("profits", PROFIT_COLUMNS), rows)
+
+    # Queries
+
+    def count(self, table: str) -> int:
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def iter_swaps(
+        self,
+        start_slot: Optional[int] = None,
+        end_slot: Optional[int] = None,
+        signer: Optional[str] = None,
+        token_pair: Optional[Tuple[str, str]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        # Ordered by (slot, tx_index), the order detection expects.
+        params: List[Any] = []
+        clauses = _range_clause("slot", start_slot, end_slot, params)
+        if signer is not None:
+            clauses.append("signer = ?")
+            params.append(signer)
+        if token_pair is not None:
+            clauses.append("token_in = ? AND token_out = ?")
+            params.extend(token_pair)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(SWAP_COLUMNS)} FROM swaps {where} "
+            "ORDER BY slot, tx_index",
+            params,
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def sandwich_legs(
+        self,
+        start_slot: Optional[int] = None,
+        end_slot: Optional[int] = None,
+        bot: Optional[str] = None,
+    ) -> List[Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]]:
+        params: List[Any] = []
+        clauses = _range_clause("s.slot", start_slot, end_slot, params)
+        if bot is not None:
+            clauses.append("s.bot = ?")
+            params.append(bot)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        selected = []
+        for alias in ("f", "v", "b"):
+            selected.extend(f"{alias}.{name}" for name in SWAP_COLUMNS)
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(selected)} FROM sandwiches s "
+            "JOIN swaps f ON f.signature = s.front_run_signature "
+            "JOIN swaps v ON v.signature = s.victim_signature "
+            "JOIN swaps b ON b.signature = s.back_run_signature "
+            f"{where} ORDER BY s.slot, f.tx_index",
+            params,
+        )
+
+        width = len(SWAP_COLUMNS)
+        legs = []
+        for row in cursor:
+            values = tuple(row)
+            legs.append(
+                tuple(
+                    dict(zip(SWAP_COLUMNS, values[i * width : (i + 1) * width]))
+                    for i in range(3)
+                )
+            )
+        return legs
+
+    def bot_profits(
+        self,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        params: List[Any] = []
+        clauses = _range_clause("priced_at", since, until, params)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = (
+            "SELECT bot, COUNT(*) AS sandwich_count, SUM(profit_usd) AS profit_usd, "
+            f"SUM(profit_sol) AS profit_sol FROM profits {where} "
+            "GROUP BY bot ORDER BY profit_usd DESC"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
@@ -0,0 +1,250 @@
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MISSING_ID = -1
+MISSING_TX_INDEX = 99999
+NPZ_SUFFIX = ".npz"
+
+# Typed column name -> array typecode
+STORE_COLUMNS = {
+    "slots": "q",
+    "tx_indexes": "q",
+    "signer_ids": "i",
+    "swap_program_ids": "i",
+    "pool_name_ids": "i",
+    "mint_in_ids": "i",
+    "mint_out_ids": "i",
+    "amounts_in": "d",
+    "amounts_out": "d",
+    "source_ata_ids": "i",
+    "destination_ata_ids": "i",
+    "priority_fees": "q",
+    "tip_account_ids": "i",
+    "tip_amounts": "q",
+    "block_times": "q",
+}
+NUMPY_DTYPES = {"q": np.int64, "i": np.int32, "d": np.float64}
+
+PROFIT_NUMERIC_COLUMNS = (
+    "sandwich_id",
+    "amount_spent",
+    "amount_received",
+    "profit_raw",
+    "profit_usd",
+    "profit_sol",
+)
+PROFIT_STRING_COLUMNS = ("bot", "token_spent", "token_received", "profit_token")
+
+
+class PubkeyInterner:
+    def __init__(self, keys: Optional[Iterable[str]] = None):
+        self.keys: List[str] = []
+        self._ids: Dict[str, int] = {}
+        for key in keys or ():
+            self.intern(key)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def intern(self, key: Optional[str]) -> int:
+        if key is None:
+            return MISSING_ID
+        key_id = self._ids.get(key)
+        if key_id is None:
+            key_id = len(self.keys)
+            self._ids[key] = key_id
+            self.keys.append(key)
+        return key_id
+
+    def get_id(self, key: str) -> int:
+        return self._ids.get(key, MISSING_ID)
+
+    def lookup(self, key_id: int) -> Optional[str]:
+        return None if key_id == MISSING_ID else self.keys[key_id]
+
+
+class SwapStore:
+    def __init__(self, interner: Optional[PubkeyInterner] = None):
+        # Pubkeys, mints and program/pool names share one interner so every
+        # string column is an int32 array of ids.
+        self.interner = interner or PubkeyInterner()
+        self.signatures: List[str] = []
+        self.slots = array("q")
+        self.tx_indexes = array("q")
+        self.signer_ids = array("i")
+        self.swap_program_ids = array("i")
+        self.pool_name_ids = array("i")
+        self.mint_in_ids = array("i")
+        self.mint_out_ids = array("i")
+        self.amounts_in = array("d")
+        self.amounts_out = array("d")
+        self.source_ata_ids = array("i")
+        self.destination_ata_ids = array("i")
+        self.priority_fees = array("q")
+        self.tip_account_ids = array("i")
+        self.tip_amounts = array("q")
+        self.block_times = array("q")
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    @classmethod
+    def from_records(cls, swaps: Iterable[Dict[str, Any]]) -> "SwapStore":
+        store = cls()
+        store.extend(swaps)
+        return store
+
+    def append(self, swap: Dict[str, Any]) -> int:
+        intern = self.interner.intern
+        priority_fee = swap.get("priority_fee")
+        block_time = swap.get("block_time")
+
+        self.signatures.append(swap["signature"])
+        self.slots.append(swap["slot"])
+        self.tx_indexes.append(swap.get("tx_index", MISSING_TX_INDEX))
+        self.signer_ids.append(intern(swap["signer"]))
+        self.swap_program_ids.append(intern(swap.get("swap_program")))
+        self.pool_name_ids.append(intern(swap.get("pool_name")))
+        self.mint_in_ids.append(intern(swap["token_in"]))
+        self.mint_out_ids.append(intern(swap["token_out"]))
+        self.amounts_in.append(float(swap["amount_in"]))
+        self.amounts_out.append(float(swap["amount_out"]))
+        self.source_ata_ids.append(intern(swap.get("user_source_ata")))
+        self.destination_ata_ids.append(intern(swap.get("user_destination_ata")))
+        self.priority_fees.append(MISSING_ID if priority_fee is None else priority_fee)
+        self.tip_account_ids.append(intern(swap.get("tip_account")))
+        self.tip_amounts.append(swap.get("tip_amount") or 0)
+        self.block_times.append(MISSING_ID if block_time is None else block_time)
+
+        return len(self.slots) - 1
+
+    def extend(self, swaps: Iterable[Dict[str, Any]]) -> None:
+        for swap in swaps:
+            self.append(swap)
+
+    def sort_order(self) -> List[int]:
+        slots = self.slots
+        tx_indexes = self.tx_indexes
+        return sorted(range(len(slots)), key=lambda i: (slots[i], tx_indexes[i]))
+
+    def record(self, i: int) -> Dict[str, Any]:
+        lookup = self.interner.lookup
+        priority_fee = self.priority_fees[i]
+        block_time = self.block_times[i]
+
+        return {
+            "signature": self.signatures[i],
+            "slot": self.slots[i],
+            "tx_index": self.tx_indexes[i],
+            "signer": lookup(self.signer_ids[i]),
+            "swap_program": lookup(self.swap_program_ids[i]),
+            "pool_name": lookup(self.pool_name_ids[i]),
+            "token_in": lookup(self.mint_in_ids[i]),
+            "token_out": lookup(self.mint_out_ids[i]),
+            "amount_in": self.amounts_in[i],
+            "amount_out": self.amounts_out[i],
+            "user_source_ata": lookup(self.source_ata_ids[i]),
+            "user_destination_ata": lookup(self.destination_ata_ids[i]),
+            "priority_fee": None if priority_fee == MISSING_ID else priority_fee,
+            "tip_account": lookup(self.tip_account_ids[i]),
+            "tip_amount": self.tip_amounts[i],
+            "block_time": None if block_time == MISSING_ID else block_time,
+        }
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+
+def is_npz_path(path) -> bool:
+    return Path(path).suffix == NPZ_SUFFIX
+
+
+def _string_array(values: Sequence[Optional[str]]) -> np.ndarray:
+    return np.array([value or "" for value in values], dtype=str)
+
+
+def store_to_arrays(store: SwapStore) -> Dict[str, np.ndarray]:
+    arrays = {
+        name: np.frombuffer(getattr(store, name), dtype=NUMPY_DTYPES[typecode])
+        for name, typecode in STORE_COLUMNS.items()
+    }
+    arrays["interned_keys"] = _string_array(store.interner.keys)
+    arrays["signatures"] = _string_array(store.signatures)
+    return arrays
+
+
+def store_from_arrays(arrays) -> SwapStore:
+    store = SwapStore(PubkeyInterner(arrays["interned_keys"].tolist()))
+    store.signatures = arrays["signatures"].tolist()
+    row_count = len(store.signatures)
+    for name, typecode in STORE_COLUMNS.items():
+        if name in arrays:
+            values = arrays[name]
+        else:
+            # Files written before a column existed load it as missing.
+            values = np.full(row_count, MISSING_ID)
+        column = array(typecode)
+        column.frombytes(
+            np.ascontiguousarray(values, dtype=NUMPY_DTYPES[typecode]).tobytes()
+        )
+        setattr(store, name, column)
+    return store
+
+
+def save_store_npz(path, store: SwapStore) -> None:
+    np.savez_compressed(path, **store_to_arrays(store))
+
+
+def load_store_npz(path) -> SwapStore:
+    with np.load(path) as arrays:
+        return store_from_arrays(arrays)
+
+
+def save_sandwiches_npz(
+    path, store: SwapStore, legs: Sequence[Tuple[int, int, int]]
+) -> None:
+    leg_array = np.array(legs, dtype=np.int64).reshape(-1, 3)
+    np.savez_compressed(
+        path,
+        front_run=leg_array[:, 0],
+        victim=leg_array[:, 1],
+        back_run=leg_array[:, 2],
+        **store_to_arrays(store),
+    )
+
+
+def load_sandwiches_npz(path) -> Tuple[SwapStore, List[Tuple[int, int, int]]]:
+    with np.load(path) as arrays:
+        store = store_from_arrays(arrays)
+        legs = list(
+            zip(
+                arrays["front_run"].tolist(),
+                arrays["victim"].tolist(),
+                arrays["back_run"].tolist(),
+            )
+        )
+    return store, legs
+
+
+def save_profit_columns_npz(path, columns: Dict[str, np.ndarray]) -> None:
+    np.savez_compressed(path, **columns)
+
+
+def save_profits_npz(path, results: List[Dict[str, Any]]) -> None:
+    columns = {
+        name: np.array([r[name] for r in results], dtype=np.float64)
+        for name in PROFIT_NUMERIC_COLUMNS
+    }
+    columns["sandwich_id"] = columns["sandwich_id"].astype(np.int64)
+    for name in PROFIT_STRING_COLUMNS:
+        columns[name] = _string_array([r[name] for r in results])
+    save_profit_columns_npz(path, columns)
+
+
+def load_profits_npz(path) -> Dict[str, np.ndarray]:
+    with np.load(path) as arrays:
+        return {name: arrays[name] for name in arrays.files}
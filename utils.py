@@ -1,6 +1,30 @@
 import asyncio
-from typing import Optional, Dict, List, Any
+import json
+import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import (
+    Optional,
+    Dict,
+    List,
+    Any,
+    Iterable,
+    Callable,
+    AsyncIterator,
+    NamedTuple,
+)
+
+from solders.pubkey import Pubkey
+from solders.rpc.config import RpcBlockConfig
+from solders.rpc.requests import GetBlock, batch_to_json
+from solders.rpc.responses import GetBlockResp
+from solders.transaction import VersionedTransaction
+from solders.transaction_status import TransactionDetails, UiTransactionEncoding
 
+import metrics
+from block_cache import BlockCache
+from rpc_pool import RpcPool
 from config import (
     RAYDIUM_PROGRAM_ID,
     ORCA_PROGRAM_ID,
@@ -13,7 +37,66 @@ from config import (
 
 MINIMUM_BALANCE_CHANGE = 0.0001
 
-BLOCK_REQUEST_DELAY_SECONDS = 0.05
+BLOCK_REQUESTS_PER_SECOND = 20
+
+MAX_CONCURRENT_BLOCK_REQUESTS = 8
+
+TIP_POLL_INTERVAL_SECONDS = 2.0
+
+MAX_CATCH_UP_SLOTS = 200
+
+# Catch-up batches a block that keeps failing is re-queued for while
+# following the tip before it is given up on.
+MAX_FOLLOW_SLOT_RETRIES = 3
+
+# Batched getBlock mode: the batch size starts small and adapts (AIMD) to
+# the provider's latency and error rate, up to the configured maximum.
+INITIAL_BLOCK_BATCH_SIZE = 4
+BLOCK_BATCH_TARGET_SECONDS = 2.0
+BLOCK_BATCH_MAX_ERROR_RATE = 0.1
+MAX_BLOCK_FETCH_ATTEMPTS = 3
+# Delay before a failed block is requested again, doubled on each attempt.
+BLOCK_RETRY_BACKOFF_SECONDS = 0.5
+
+# getBlock transaction encodings. base64 returns compiled transactions,
+# several times smaller and faster to deserialize than jsonParsed.
+BLOCK_ENCODINGS = ("jsonParsed", "base64")
+DEFAULT_BLOCK_ENCODING = "jsonParsed"
+
+# JSON-RPC error codes getBlock returns for slots that produced no block:
+# skipped by the leader, or skipped and missing from long-term storage.
+SKIPPED_SLOT_ERROR_CODES = (-32007, -32009)
+
+# getBlock responses at most this size are checked for RPC errors when
+# routed through an RpcPool.
+MAX_ERROR_RESPONSE_BYTES = 4096
+
+# Batch responses are split on the objects' '{"jsonrpc":' openings. That
+# text can't occur inside a JSON string, where quotes are always escaped.
+BATCH_ITEM_START = re.compile(r'\{\s*"jsonrpc"\s*:')
+BATCH_ITEM_LEADING_ID = re.compile(
+    r'\{\s*"jsonrpc"\s*:\s*"2\.0"\s*,\s*"id"\s*:\s*(\d+)'
+)
+BATCH_ITEM_TRAILING_ID = re.compile(r',\s*"id"\s*:\s*(\d+)\s*\}$')
+
+SWAP_RECORD_FIELDS = (
+    "signature",
+    "slot",
+    "tx_index",
+    "signer",
+    "swap_program",
+    "pool_name",
+    "token_in",
+    "token_out",
+    "amount_in",
+    "amount_out",
+    "user_source_ata",
+    "user_destination_ata",
+    "priority_fee",
+    "tip_account",
+    "tip_amount",
+    "block_time",
+)
 
 KNOWN_DEX_PROGRAMS = {
     RAYDIUM_PROGRAM_ID: "Raydium AMM",
@@ -23,6 +106,116 @@ KNOWN_DEX_PROGRAMS = {
 
 ALL_SWAP_PROGRAMS = KNOWN_DEX_PROGRAMS
 
+# Both forms so membership works for solders Pubkeys and plain strings.
+SWAP_PROGRAM_KEYS = frozenset(
+    [Pubkey.from_string(program_id) for program_id in ALL_SWAP_PROGRAMS]
+    + list(ALL_SWAP_PROGRAMS)
+)
+
+
+class ResolvedInstruction(NamedTuple):
+    program_id: Pubkey
+
+
+class ResolvedInnerInstructions(NamedTuple):
+    index: int
+    instructions: List[ResolvedInstruction]
+
+
+def resolve_instructions(instructions, account_keys) -> List[ResolvedInstruction]:
+    return [
+        ResolvedInstruction(account_keys[instruction.program_id_index])
+        for instruction in instructions
+    ]
+
+
+class ResolvedMessage:
+    # A compiled message with its full account key list: static keys, then
+    # lookup table addresses (writable, then readonly), the order instruction
+    # and token balance indexes refer to. Instructions carry their program id
+    # like jsonParsed ones do.
+    def __init__(self, message, loaded_addresses=None):
+        self.account_keys = list(message.account_keys)
+        if loaded_addresses is not None:
+            self.account_keys.extend(loaded_addresses.writable)
+            self.account_keys.extend(loaded_addresses.readonly)
+        self._compiled_instructions = message.instructions
+        self._instructions: Optional[List[ResolvedInstruction]] = None
+
+    @property
+    def instructions(self) -> List[ResolvedInstruction]:
+        if self._instructions is None:
+            self._instructions = resolve_instructions(
+                self._compiled_instructions, self.account_keys
+            )
+        return self._instructions
+
+
+class ResolvedMeta:
+    # Transaction meta whose inner instructions carry program ids; every
+    # other field is read from the wrapped meta.
+    def __init__(self, meta, account_keys: List[Pubkey]):
+        self._meta = meta
+        self._account_keys = account_keys
+        self._inner_instructions: Optional[List[ResolvedInnerInstructions]] = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._meta, name)
+
+    @property
+    def inner_instructions(self) -> List[ResolvedInnerInstructions]:
+        if self._inner_instructions is None:
+            self._inner_instructions = [
+                ResolvedInnerInstructions(
+                    group.index,
+                    resolve_instructions(group.instructions, self._account_keys),
+                )
+                for group in self._meta.inner_instructions or []
+            ]
+        return self._inner_instructions
+
+
+class ResolvedTransaction(NamedTuple):
+    signatures: List[Any]
+    message: ResolvedMessage
+
+
+class DecodedTransaction(NamedTuple):
+    transaction: ResolvedTransaction
+    meta: Any
+
+
+def resolve_transaction(transaction):
+    # base64-encoded transactions decode to compiled VersionedTransactions;
+    # give them the jsonParsed attribute layout the extractors below read.
+    # jsonParsed transactions pass through unchanged.
+    decoded = transaction.transaction
+    if not isinstance(decoded, VersionedTransaction):
+        return transaction
+
+    meta = transaction.meta
+    message = ResolvedMessage(
+        decoded.message, getattr(meta, "loaded_addresses", None)
+    )
+    return DecodedTransaction(
+        ResolvedTransaction(decoded.signatures, message),
+        ResolvedMeta(meta, message.account_keys) if meta is not None else None,
+    )
+
+
+def is_swap_candidate(transaction) -> bool:
+    # Every program a transaction invokes, including CPIs, appears in its
+    # account keys, so a transaction that never references a swap program
+    # can be rejected before any log or balance parsing.
+    try:
+        account_keys = transaction.transaction.message.account_keys
+    except AttributeError:
+        return True
+
+    return not SWAP_PROGRAM_KEYS.isdisjoint(
+        getattr(key, "pubkey", key) for key in account_keys
+    )
+
 
 def is_swap_by_logs(log_messages: List[str]) -> bool:
     if not log_messages:
@@ -323,25 +516,39 @@ def extract_priority_fee_and_tip(transaction) -> Dict[str, Any]:
     }
 
 
+def _reject(rejections: Optional[Dict[str, int]], reason: str) -> None:
+    if rejections is not None:
+        rejections[reason] = rejections.get(reason, 0) + 1
+
+
 def extract_swap_transaction_data(
     transaction,
     slot_number: int,
     tx_index: int,
     program_to_pool_mapping: Dict[str, str],
+    rejections: Optional[Dict[str, int]] = None,
 ) -> Optional[Dict[str, Any]]:
+    # rejections, when given, counts why transactions yield no swap record.
+    if not is_swap_candidate(transaction):
+        _reject(rejections, "no_swap_program")
+        return None
+
     is_dex_transaction, detected_dex_name = identify_dex_program(transaction)
 
     if not is_dex_transaction:
+        _reject(rejections, "not_dex_swap")
         return None
 
     signer_address = extract_transaction_signer(transaction)
 
     if not signer_address:
+        _reject(rejections, "no_signer")
         return None
 
     swap_details = calculate_token_balance_changes(transaction, signer_address)
 
     if not swap_details:
+        _reject(rejections, "no_token_flow")
         return None
 
     pool_name = detected_dex_name
@@ -383,63 +590,828 @@ def extract_swap_transaction_data(
     }
 
 
-async def process_single_block(
-    rpc_client, slot_number: int, program_to_pool_mapping: Dict[str, str]
-) -> List[Dict[str, Any]]:
-    block_response = await rpc_client.get_block(
-        slot_number, encoding="jsonParsed", max_supported_transaction_version=0
+def get_block_request(
+    slot_number: int,
+    request_id: int = 0,
+    encoding: str = DEFAULT_BLOCK_ENCODING,
+) -> GetBlock:
+    if encoding == "jsonParsed":
+        block_config = RpcBlockConfig(
+            encoding=UiTransactionEncoding.JsonParsed,
+            max_supported_transaction_version=0,
+        )
+    elif encoding == "base64":
+        # Full details are still needed for logs and instructions; block
+        # rewards never are.
+        block_config = RpcBlockConfig(
+            encoding=UiTransactionEncoding.Base64,
+            transaction_details=TransactionDetails.Full,
+            rewards=False,
+            max_supported_transaction_version=0,
+        )
+    else:
+        raise ValueError(f"Unsupported block encoding: {encoding}")
+    return GetBlock(slot_number, block_config, id=request_id)
+
+
+async def fetch_raw_block(
+    rpc_client, slot_number: int, encoding: str = DEFAULT_BLOCK_ENCODING
+) -> str:
+    body = get_block_request(slot_number, encoding=encoding).to_json()
+
+    async def fetch(client) -> str:
+        raw_block = await client.post_raw(body)
+        raise_for_rpc_error(raw_block)
+        return raw_block
+
+    if isinstance(rpc_client, RpcPool):
+        return await rpc_client.call(fetch)
+    return await fetch(rpc_client)
+
+
+def raise_for_rpc_error(raw_response: str) -> None:
+    # Turns rate limits and lagging nodes into fetch errors, which are
+    # retried (and let the pool fail over) instead of failing to parse.
+    # Only short responses are decoded: error responses are small and blocks
+    # are not. Skipped slots are an answer, not a failure, and pass through.
+    if len(raw_response) > MAX_ERROR_RESPONSE_BYTES:
+        return
+    error = json.loads(raw_response).get("error")
+    if error is not None and not is_skipped_slot_error(error):
+        raise RuntimeError(f"RPC error: {error}")
+
+
+def is_skipped_slot_error(error) -> bool:
+    # getBlock answers skipped slots with an error instead of a block. Takes
+    # a JSON-RPC error object, or an exception or message mentioning one.
+    if isinstance(error, dict):
+        if error.get("code") in SKIPPED_SLOT_ERROR_CODES:
+            return True
+        error = error.get("message", "")
+    text = str(error).lower()
+    return "skipped" in text or any(
+        str(code) in text for code in SKIPPED_SLOT_ERROR_CODES
+    )
+
+
+class BatchItemErrors(RuntimeError):
+    # Raised through RpcPool.call() when too many items of a batch failed, so
+    # the endpoint is charged with a failure; carries the blocks that did
+    # come back.
+    def __init__(self, raw_blocks: Dict[int, str], error_count: int):
+        super().__init__(f"{error_count} getBlock errors in batch")
+        self.raw_blocks = raw_blocks
+
+
+def _end_of_value(raw: str, index: int, closing: str) -> Optional[int]:
+    # Steps back over whitespace and the expected closing character; returns
+    # the index just past the item's own closing brace.
+    while index > 0 and raw[index - 1].isspace():
+        index -= 1
+    if index == 0 or raw[index - 1] != closing:
+        return None
+    index -= 1
+    while index > 0 and raw[index - 1].isspace():
+        index -= 1
+    if index == 0 or raw[index - 1] != "}":
+        return None
+    return index
+
+
+def split_batch_items(raw_response: str) -> Optional[List[str]]:
+    # Slices a batch response into the raw text of each item without
+    # decoding the blocks inside. None if the layout isn't recognized.
+    starts = [match.start() for match in BATCH_ITEM_START.finditer(raw_response)]
+    if not starts or raw_response[: starts[0]].strip() != "[":
+        return None
+
+    items = []
+    bounds = starts[1:] + [len(raw_response)]
+    for start, bound in zip(starts, bounds):
+        closing = "]" if bound == len(raw_response) else ","
+        end = _end_of_value(raw_response, bound, closing)
+        if end is None or end <= start:
+            return None
+        items.append(raw_response[start:end])
+    return items
+
+
+def batch_item_header(item: str) -> tuple[Optional[int], Optional[dict]]:
+    # (request id, error) of one batch item. Errors are small, so only short
+    # items are decoded; a block's id is read off its first or last key.
+    if len(item) > MAX_ERROR_RESPONSE_BYTES:
+        match = BATCH_ITEM_LEADING_ID.match(item) or BATCH_ITEM_TRAILING_ID.search(
+            item, len(item) - 64
+        )
+        if match:
+            return int(match.group(1)), None
+    response = json.loads(item)
+    return response.get("id"), response.get("error")
+
+
+def split_batch_response(raw_response: str, slots: List[int]) -> Dict[int, str]:
+    # Fans a JSON-RPC batch response back out into one raw getBlock response
+    # per slot, matched on the request id (the slot's index in the batch),
+    # since servers may answer in any order. Each block's text is sliced out
+    # as-is, so it is deserialized once, by the parser. Errors other than
+    # skipped slots (rate limits, timeouts) are left out so the caller
+    # retries them.
+    items = split_batch_items(raw_response)
+    if items is None or len(items) > len(slots):
+        # Unfamiliar layout: decode everything and re-encode each item.
+        responses = json.loads(raw_response)
+        if not isinstance(responses, list):
+            raise RuntimeError(f"Batch getBlock failed: {raw_response[:200]}")
+        items = [json.dumps(response) for response in responses]
+
+    raw_blocks: Dict[int, str] = {}
+    for item in items:
+        request_id, error = batch_item_header(item)
+        if not isinstance(request_id, int) or not 0 <= request_id < len(slots):
+            continue
+        if error is not None and not is_skipped_slot_error(error):
+            continue
+        raw_blocks[slots[request_id]] = item
+    return raw_blocks
+
+
+async def fetch_raw_blocks_batch(
+    rpc_client, slots: List[int], encoding: str = DEFAULT_BLOCK_ENCODING
+) -> Dict[int, str]:
+    # One HTTP request for many getBlock calls, posted through the client's
+    # raw session.
+    body = batch_to_json(
+        [
+            get_block_request(slot, request_id, encoding)
+            for request_id, slot in enumerate(slots)
+        ]
     )
 
-    if not block_response.value:
+    async def fetch(client) -> Dict[int, str]:
+        raw_response = await client.post_raw(body)
+        return await asyncio.to_thread(split_batch_response, raw_response, slots)
+
+    if not isinstance(rpc_client, RpcPool):
+        return await fetch(rpc_client)
+
+    async def fetch_checked(client) -> Dict[int, str]:
+        # Providers throttle batches with per-item 429s inside an HTTP 200;
+        # count those against the endpoint so the pool fails over.
+        raw_blocks = await fetch(client)
+        error_count = len(slots) - len(raw_blocks)
+        if error_count > BLOCK_BATCH_MAX_ERROR_RATE * len(slots):
+            raise BatchItemErrors(raw_blocks, error_count)
+        return raw_blocks
+
+    try:
+        return await rpc_client.call(fetch_checked)
+    except BatchItemErrors as e:
+        # Every endpoint was throttling; keep what the last one returned.
+        return e.raw_blocks
+
+
+async def get_produced_slots(rpc_client, first_slot: int, last_slot: int) -> List[int]:
+    # Slots in [first_slot, last_slot] that have a block, per getBlocks.
+    response = await rpc_client.get_blocks(first_slot, last_slot)
+    return list(response.value)
+
+
+async def slots_to_fetch(
+    rpc_client, first_slot: int, last_slot: int, skip_empty_slots: bool = False
+) -> List[int]:
+    slots = list(range(first_slot, last_slot + 1))
+    if not skip_empty_slots or not slots:
+        return slots
+    try:
+        produced = set(await get_produced_slots(rpc_client, first_slot, last_slot))
+    except Exception as e:
+        print(f"  [WARN] getBlocks failed, requesting every slot: {e}")
+        return slots
+
+    kept = [slot for slot in slots if slot in produced]
+    if len(kept) < len(slots):
+        metrics.SLOTS_FAILED.inc(len(slots) - len(kept), reason="skipped")
+        print(f"  Skipping {len(slots) - len(kept)} slots with no block (getBlocks)")
+    return kept
+
+
+class AdaptiveBatchSize:
+    # Additive increase, multiplicative decrease: one more block per batch
+    # after a full batch that was fast and clean, half as many after a slow
+    # or failing one.
+    def __init__(
+        self,
+        max_size: int,
+        initial_size: int = INITIAL_BLOCK_BATCH_SIZE,
+        target_seconds: float = BLOCK_BATCH_TARGET_SECONDS,
+        max_error_rate: float = BLOCK_BATCH_MAX_ERROR_RATE,
+    ):
+        self.max_size = max(1, max_size)
+        self.size = max(1, min(initial_size, self.max_size))
+        self.target_seconds = target_seconds
+        self.max_error_rate = max_error_rate
+
+    def record(self, seconds: float, request_count: int, error_count: int) -> None:
+        error_rate = error_count / request_count if request_count else 1.0
+        if error_rate > self.max_error_rate or seconds > self.target_seconds:
+            self.size = max(1, self.size // 2)
+        elif request_count >= self.size:
+            self.size = min(self.max_size, self.size + 1)
+
+
+def parse_block_response(raw_block: str):
+    block_response = GetBlockResp.from_json(raw_block)
+    if not isinstance(block_response, GetBlockResp):
+        raise RuntimeError(f"getBlock failed: {block_response}")
+    return block_response.value
+
+
+def extract_swaps_from_block(
+    block_data,
+    slot_number: int,
+    program_to_pool_mapping: Dict[str, str],
+    rejections: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    if not block_data:
         return []
 
-    block_data = block_response.value
     discovered_swaps = []
+    block_time = getattr(block_data, "block_time", None)
 
     transactions = getattr(block_data, "transactions", []) or []
     for tx_index, transaction in enumerate(transactions):
         swap_data = extract_swap_transaction_data(
-            transaction, slot_number, tx_index, program_to_pool_mapping
+            resolve_transaction(transaction),
+            slot_number,
+            tx_index,
+            program_to_pool_mapping,
+            rejections,
         )
 
         if swap_data:
+            swap_data["block_time"] = block_time
             discovered_swaps.append(swap_data)
 
     return discovered_swaps
 
 
-async def parse_blocks_for_txns(
-    rpc_client, pool_configurations: List[Dict[str, str]], slot_window: int = 50
+def block_transaction_count(block_data) -> int:
+    return len(getattr(block_data, "transactions", None) or []) if block_data else 0
+
+
+def parse_block_records(
+    raw_block: str, slot_number: int, program_to_pool_mapping: Dict[str, str]
+) -> tuple[List[tuple], int, Dict[str, int]]:
+    # Runs inside parser pool workers: returns plain tuples in
+    # SWAP_RECORD_FIELDS order, which pickle far smaller than dicts, plus the
+    # block's transaction count and rejection reasons, since metrics
+    # recorded in a worker process would never reach the parent.
+    block_data = parse_block_response(raw_block)
+    rejections: Dict[str, int] = {}
+    records = [
+        tuple(swap[field] for field in SWAP_RECORD_FIELDS)
+        for swap in extract_swaps_from_block(
+            block_data, slot_number, program_to_pool_mapping, rejections
+        )
+    ]
+    return records, block_transaction_count(block_data), rejections
+
+
+def swap_record_to_dict(record: tuple) -> Dict[str, Any]:
+    return dict(zip(SWAP_RECORD_FIELDS, record))
+
+
+def create_parser_pool(worker_count: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=worker_count)
+
+
+class BlockFetchError(RuntimeError):
+    # The block could not be fetched from RPC; worth retrying, unlike a
+    # skipped slot or a block that failed to parse.
+    pass
+
+
+async def process_single_block(
+    rpc_client,
+    slot_number: int,
+    program_to_pool_mapping: Dict[str, str],
+    block_cache: Optional[BlockCache] = None,
+    parser_pool: Optional[Executor] = None,
+    block_encoding: str = DEFAULT_BLOCK_ENCODING,
+) -> List[Dict[str, Any]]:
+    # Cached blocks are used whatever encoding they were fetched with.
+    raw_block = None
+    if block_cache is not None:
+        raw_block = await asyncio.to_thread(block_cache.get, slot_number)
+
+    fetched_from_rpc = raw_block is None
+    if fetched_from_rpc:
+        started = time.perf_counter()
+        try:
+            raw_block = await fetch_raw_block(rpc_client, slot_number, block_encoding)
+        except Exception as e:
+            raise BlockFetchError(f"getBlock {slot_number} failed: {e}") from e
+        finally:
+            metrics.BLOCK_FETCH_SECONDS.observe(time.perf_counter() - started)
+    metrics.BLOCK_SOURCE.inc(source="rpc" if fetched_from_rpc else "cache")
+
+    try:
+        swaps = await parse_raw_block(
+            raw_block, slot_number, program_to_pool_mapping, parser_pool
+        )
+    except Exception:
+        # A cached block that no longer parses would fail on every run.
+        if not fetched_from_rpc and block_cache is not None:
+            await asyncio.to_thread(block_cache.evict, slot_number)
+        raise
+
+    # Only responses that parsed cleanly are worth keeping.
+    if fetched_from_rpc and block_cache is not None:
+        await asyncio.to_thread(block_cache.put, slot_number, raw_block)
+
+    return swaps
+
+
+async def parse_raw_block(
+    raw_block: str,
+    slot_number: int,
+    program_to_pool_mapping: Dict[str, str],
+    parser_pool: Optional[Executor] = None,
 ) -> List[Dict[str, Any]]:
+    started = time.perf_counter()
+    try:
+        if parser_pool is not None:
+            records, transaction_count, rejections = (
+                await asyncio.get_running_loop().run_in_executor(
+                    parser_pool,
+                    parse_block_records,
+                    raw_block,
+                    slot_number,
+                    program_to_pool_mapping,
+                )
+            )
+            swaps = [swap_record_to_dict(record) for record in records]
+        else:
+            rejections = {}
+            block_data = parse_block_response(raw_block)
+            transaction_count = block_transaction_count(block_data)
+            swaps = extract_swaps_from_block(
+                block_data, slot_number, program_to_pool_mapping, rejections
+            )
+    except Exception as e:
+        metrics.SLOTS_FAILED.inc(
+            reason="skipped" if is_skipped_slot_error(e) else "parse_error"
+        )
+        raise
+    parse_seconds = time.perf_counter() - started
+
+    metrics.BLOCK_PARSE_SECONDS.observe(parse_seconds)
+    if transaction_count:
+        metrics.TRANSACTION_PARSE_SECONDS.observe(
+            parse_seconds / transaction_count, count=transaction_count
+        )
+    metrics.TRANSACTIONS_PARSED.inc(transaction_count)
+    metrics.SWAPS_EXTRACTED.inc(len(swaps))
+    metrics.record_rejections(rejections)
+    return swaps
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+async def fetch_blocks_concurrently(
+    rpc_client,
+    slots: Iterable[int],
+    program_to_pool_mapping: Dict[str, str],
+    max_concurrent_requests: int = MAX_CONCURRENT_BLOCK_REQUESTS,
+    requests_per_second: Optional[float] = BLOCK_REQUESTS_PER_SECOND,
+    on_slot: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    block_cache: Optional[BlockCache] = None,
+    parser_pool: Optional[Executor] = None,
+    max_batch_size: int = 0,
+    block_encoding: str = DEFAULT_BLOCK_ENCODING,
+) -> tuple[Dict[int, int], List[int]]:
+    # Swaps reach the caller only through on_slot and are dropped once it has
+    # seen them, so memory is bounded by slots finished out of order rather
+    # than by the scan size. Returns swap counts per processed slot.
+    # max_batch_size > 0 packs uncached slots into batched getBlock requests;
+    # the rate limit then applies per batch, i.e. per HTTP request.
+    rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+    batch_size = AdaptiveBatchSize(max_batch_size) if max_batch_size > 0 else None
+    attempts: Dict[int, int] = {}
+    ordered_slots = list(slots)
+    slot_queue: asyncio.Queue = asyncio.Queue()
+    for slot in ordered_slots:
+        slot_queue.put_nowait(slot)
+
+    swap_counts: Dict[int, int] = {}
+    pending_swaps: Dict[int, List[Dict[str, Any]]] = {}
+    failed_slots: List[int] = []
+    finished_slots = set()
+    next_release = 0
+    # Slots not yet finished, counting ones waiting out a retry backoff;
+    # workers stop only when it reaches zero.
+    outstanding = len(ordered_slots)
+    all_finished = asyncio.Event()
+    retry_timers: List[asyncio.TimerHandle] = []
+
+    # on_slot sees processed slots in the order they were requested, as soon
+    # as every slot before them has finished; failed slots are skipped.
+    def release_finished_slots() -> None:
+        nonlocal next_release
+        while (
+            next_release < len(ordered_slots)
+            and ordered_slots[next_release] in finished_slots
+        ):
+            slot = ordered_slots[next_release]
+            next_release += 1
+            if slot in pending_swaps:
+                on_slot(slot, pending_swaps.pop(slot))
+
+    def finish_slot(slot: int, swaps: Optional[List[Dict[str, Any]]]) -> None:
+        nonlocal outstanding
+        if swaps is None:
+            failed_slots.append(slot)
+        else:
+            swap_counts[slot] = len(swaps)
+            if on_slot:
+                pending_swaps[slot] = swaps
+        finished_slots.add(slot)
+        if on_slot:
+            release_finished_slots()
+        outstanding -= 1
+        if outstanding <= 0:
+            all_finished.set()
+
+    async def process_slot(target_slot: int) -> None:
+        # Cached blocks cost no RPC request, so only throttle on a miss.
+        if rate_limiter and not (block_cache is not None and target_slot in block_cache):
+            await rate_limiter.acquire()
+
+        try:
+            swaps = await process_single_block(
+                rpc_client,
+                target_slot,
+                program_to_pool_mapping,
+                block_cache,
+                parser_pool,
+                block_encoding,
+            )
+        except BlockFetchError:
+            retry_or_fail([target_slot])
+            return
+        except Exception as e:
+            # A skipped slot has no block and so no swaps; it isn't a failure.
+            swaps = [] if is_skipped_slot_error(e) else None
+        finish_slot(target_slot, swaps)
+
+    async def parse_batch_block(slot: int, raw_block: str) -> None:
+        metrics.BLOCK_SOURCE.inc(source="rpc")
+        try:
+            swaps = await parse_raw_block(
+                raw_block, slot, program_to_pool_mapping, parser_pool
+            )
+        except Exception as e:
+            swaps = [] if is_skipped_slot_error(e) else None
+        else:
+            if block_cache is not None:
+                await asyncio.to_thread(block_cache.put, slot, raw_block)
+        finish_slot(slot, swaps)
+
+    def retry_or_fail(slots: List[int]) -> None:
+        # Slots whose fetch failed go back on the queue after a backoff that
+        # doubles with each attempt. The requeue runs on a timer, so the
+        # worker moves on to other slots meanwhile.
+        retries = []
+        for slot in slots:
+            attempts[slot] = attempts.get(slot, 0) + 1
+            if attempts[slot] < MAX_BLOCK_FETCH_ATTEMPTS:
+                retries.append(slot)
+            else:
+                metrics.SLOTS_FAILED.inc(reason="fetch_error")
+                finish_slot(slot, None)
+        if not retries:
+            return
+        attempt = max(attempts[slot] for slot in retries)
+        retry_timers.append(
+            asyncio.get_running_loop().call_later(
+                BLOCK_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1), requeue, retries
+            )
+        )
+
+    def requeue(slots: List[int]) -> None:
+        for slot in slots:
+            slot_queue.put_nowait(slot)
+
+    async def process_batch(slots: List[int]) -> None:
+        uncached = []
+        for slot in slots:
+            if block_cache is not None and slot in block_cache:
+                await process_slot(slot)
+            else:
+                uncached.append(slot)
+        if not uncached:
+            return
+
+        if rate_limiter:
+            await rate_limiter.acquire()
+        started = time.perf_counter()
+        try:
+            raw_blocks = await fetch_raw_blocks_batch(
+                rpc_client, uncached, block_encoding
+            )
+        except Exception:
+            elapsed = time.perf_counter() - started
+            batch_size.record(elapsed, len(uncached), len(uncached))
+            retry_or_fail(uncached)
+            return
+
+        elapsed = time.perf_counter() - started
+        metrics.BLOCK_FETCH_SECONDS.observe(
+            elapsed / len(uncached), count=len(uncached)
+        )
+        metrics.BLOCK_BATCH_SIZE.observe(len(uncached))
+        missing = [slot for slot in uncached if slot not in raw_blocks]
+        batch_size.record(elapsed, len(uncached), len(missing))
+
+        # Fan the responses out to the parser; with a parser pool they are
+        # decoded in parallel.
+        await asyncio.gather(
+            *(parse_batch_block(slot, raw) for slot, raw in raw_blocks.items())
+        )
+        retry_or_fail(missing)
+
+    async def worker() -> None:
+        # Workers outlive a momentarily empty queue, so retried slots are
+        # fetched with the same concurrency as the first pass.
+        while True:
+            target_slot = await slot_queue.get()
+            if batch_size is None:
+                await process_slot(target_slot)
+                continue
+
+            batch = [target_slot]
+            while len(batch) < batch_size.size and not slot_queue.empty():
+                batch.append(slot_queue.get_nowait())
+            await process_batch(batch)
 
-    current_slot_response = await rpc_client.get_slot()
-    current_slot = current_slot_response.value
+    worker_count = max(1, min(max_concurrent_requests, slot_queue.qsize()))
+    if outstanding:
+        workers = [asyncio.ensure_future(worker()) for _ in range(worker_count)]
+        finished = asyncio.ensure_future(all_finished.wait())
+        try:
+            # A worker only returns by raising, which is propagated.
+            done, _ = await asyncio.wait(
+                [finished, *workers], return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                task.result()
+        finally:
+            for timer in retry_timers:
+                timer.cancel()
+            for task in [finished, *workers]:
+                task.cancel()
+            await asyncio.gather(finished, *workers, return_exceptions=True)
+
+    return swap_counts, sorted(failed_slots)
+
+
+async def parse_blocks_for_txns(
+    rpc_client,
+    pool_configurations: List[Dict[str, str]],
+    slot_window: int = 50,
+    max_concurrent_requests: int = MAX_CONCURRENT_BLOCK_REQUESTS,
+    requests_per_second: Optional[float] = BLOCK_REQUESTS_PER_SECOND,
+    on_slot: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    block_cache: Optional[BlockCache] = None,
+    end_slot: Optional[int] = None,
+    parser_pool: Optional[Executor] = None,
+    max_batch_size: int = 0,
+    block_encoding: str = DEFAULT_BLOCK_ENCODING,
+) -> int:
+    # Swaps are handed to on_slot as each slot completes; only the total
+    # count is returned.
+    if end_slot is None:
+        current_slot_response = await rpc_client.get_slot()
+        current_slot = current_slot_response.value
+    else:
+        current_slot = end_slot
 
     print(f"\nScanning {slot_window} recent slots starting from slot {current_slot}")
+    print(
+        f"  Concurrency: {max_concurrent_requests} in-flight requests, "
+        f"rate limit: {requests_per_second or 'none'} req/s"
+    )
+    if max_batch_size:
+        print(f"  Batching up to {max_batch_size} getBlock calls per request")
+    if block_encoding != DEFAULT_BLOCK_ENCODING:
+        print(f"  Block encoding: {block_encoding}")
 
     program_to_pool_mapping = {
         pool["address"]: pool["name"] for pool in pool_configurations
     }
 
-    all_discovered_transactions = []
-    blocks_successfully_processed = 0
+    # Batched mode also asks getBlocks which slots exist before fetching.
+    slots = await slots_to_fetch(
+        rpc_client,
+        current_slot - slot_window + 1,
+        current_slot,
+        skip_empty_slots=max_batch_size > 0,
+    )
+    swap_counts, failed_slots = await fetch_blocks_concurrently(
+        rpc_client,
+        slots,
+        program_to_pool_mapping,
+        max_concurrent_requests=max_concurrent_requests,
+        requests_per_second=requests_per_second,
+        on_slot=on_slot,
+        block_cache=block_cache,
+        parser_pool=parser_pool,
+        max_batch_size=max_batch_size,
+        block_encoding=block_encoding,
+    )
 
-    for target_slot in range(current_slot, current_slot - slot_window, -1):
+    swap_count = sum(swap_counts.values())
 
-        try:
-            block_transactions = await process_single_block(
-                rpc_client, target_slot, program_to_pool_mapping
-            )
+    print(f"Successfully processed {len(swap_counts)} slots")
+    if block_cache is not None:
+        print(
+            f"Block cache: {block_cache.hits} hits, {block_cache.misses} misses "
+            f"({len(block_cache)} blocks, {block_cache.total_bytes / 1e6:.1f} MB)"
+        )
+    if failed_slots:
+        print(f"Failed to fetch {len(failed_slots)} blocks")
+    print(f"Found {swap_count} swap transactions\n")
 
-            all_discovered_transactions.extend(block_transactions)
-            blocks_successfully_processed += 1
+    return swap_count
 
-            await asyncio.sleep(BLOCK_REQUEST_DELAY_SECONDS)
 
-        except Exception:
+def load_last_processed_slot(state_file) -> Optional[int]:
+    path = Path(state_file)
+    if not path.exists():
+        return None
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return int(json.load(f)["last_processed_slot"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def save_last_processed_slot(state_file, slot: int) -> None:
+    path = Path(state_file)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump({"last_processed_slot": slot}, f)
+    tmp_path.replace(path)
+
+
+async def follow_chain_tip(
+    rpc_client,
+    pool_configurations: List[Dict[str, str]],
+    on_slot: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    state_file=None,
+    start_slot: Optional[int] = None,
+    poll_interval: float = TIP_POLL_INTERVAL_SECONDS,
+    max_catch_up_slots: int = MAX_CATCH_UP_SLOTS,
+    max_concurrent_requests: int = MAX_CONCURRENT_BLOCK_REQUESTS,
+    requests_per_second: Optional[float] = BLOCK_REQUESTS_PER_SECOND,
+    block_cache: Optional[BlockCache] = None,
+    parser_pool: Optional[Executor] = None,
+    max_batch_size: int = 0,
+    block_encoding: str = DEFAULT_BLOCK_ENCODING,
+) -> AsyncIterator[Dict[str, Any]]:
+    # on_slot sees slots in increasing order even though failed blocks are
+    # fetched again in later batches: slots above a block still awaiting a
+    # retry are held back until it arrives or is given up on.
+    program_to_pool_mapping = {
+        pool["address"]: pool["name"] for pool in pool_configurations
+    }
+
+    if start_slot is not None:
+        last_processed_slot = start_slot - 1
+    else:
+        last_processed_slot = load_last_processed_slot(state_file) if state_file else None
+
+    if last_processed_slot is None:
+        last_processed_slot = (await rpc_client.get_slot()).value - 1
+
+    print(f"\nFollowing chain tip from slot {last_processed_slot + 1}")
+
+    # Failed slots awaiting a retry, with the number of batches they have
+    # failed in so far, and swaps of later slots held back behind them.
+    retry_rounds: Dict[int, int] = {}
+    held_swaps: Dict[int, List[Dict[str, Any]]] = {}
+
+    def release_held_slots(blocking: Iterable[int]) -> None:
+        first_blocking = min(blocking, default=None)
+        for slot in sorted(held_swaps):
+            if first_blocking is not None and slot > first_blocking:
+                break
+            swaps = held_swaps.pop(slot)
+            if on_slot:
+                on_slot(slot, swaps)
+
+    while True:
+        tip_slot = (await rpc_client.get_slot()).value
+        if tip_slot <= last_processed_slot:
+            await asyncio.sleep(poll_interval)
             continue
 
-    print(f"Successfully processed {blocks_successfully_processed} blocks")
-    print(f"Found {len(all_discovered_transactions)} swap transactions\n")
+        # Catch up in bounded batches so a long outage does not queue
+        # thousands of slots at once.
+        batch_end = min(tip_slot, last_processed_slot + max_catch_up_slots)
+        retried_slots = sorted(retry_rounds)
+        slots = await slots_to_fetch(
+            rpc_client,
+            last_processed_slot + 1,
+            batch_end,
+            skip_empty_slots=max_batch_size > 0,
+        )
+        requested = retried_slots + slots
+        position = {slot: i for i, slot in enumerate(requested)}
+        blocking = set(retried_slots)
+        next_position = 0
+
+        def hold_slot(slot: int, swaps: List[Dict[str, Any]]) -> None:
+            # Slots arrive in request order with failed ones left out, so a
+            # requested slot passed over here has failed and will be retried.
+            nonlocal next_position
+            index = position[slot]
+            blocking.update(requested[next_position:index])
+            next_position = index + 1
+            blocking.discard(slot)
+            held_swaps[slot] = swaps
+            release_held_slots(blocking)
+
+        swap_counts, failed_slots = await fetch_blocks_concurrently(
+            rpc_client,
+            requested,
+            program_to_pool_mapping,
+            max_concurrent_requests=max_concurrent_requests,
+            requests_per_second=requests_per_second,
+            on_slot=hold_slot,
+            block_cache=block_cache,
+            parser_pool=parser_pool,
+            max_batch_size=max_batch_size,
+            block_encoding=block_encoding,
+        )
 
-    return all_discovered_transactions
+        # Fetch errors were already retried with backoff inside the batch;
+        # blocks that still failed are re-queued ahead of the next batch, up
+        # to MAX_FOLLOW_SLOT_RETRIES batches.
+        abandoned_slots = []
+        next_retry_rounds = {}
+        for slot in failed_slots:
+            rounds = retry_rounds.get(slot, 0) + 1
+            if rounds < MAX_FOLLOW_SLOT_RETRIES:
+                next_retry_rounds[slot] = rounds
+            else:
+                abandoned_slots.append(slot)
+        retry_rounds = next_retry_rounds
+        release_held_slots(retry_rounds)
+
+        last_processed_slot = batch_end
+        if state_file:
+            # Resume from the first slot on_slot has not seen, so held slots
+            # are fetched again after a restart rather than lost.
+            resume_after = (
+                min(retry_rounds) - 1 if retry_rounds else last_processed_slot
+            )
+            save_last_processed_slot(state_file, resume_after)
+
+        yield {
+            "last_processed_slot": last_processed_slot,
+            "tip_slot": tip_slot,
+            "slots_behind": tip_slot - last_processed_slot,
+            "blocks_processed": len(swap_counts),
+            "retried_slots": retried_slots,
+            "failed_slots": failed_slots,
+            "abandoned_slots": abandoned_slots,
+            "held_slots": len(held_swaps),
+            "swap_count": sum(swap_counts.values()),
+        }
+
+        if last_processed_slot >= tip_slot:
+            await asyncio.sleep(poll_interval)